@@ -3,6 +3,7 @@ from .encoding_config import configure_encoding
 from .timezone_config import configure_timezone
 from .blueprints_config import register_blueprints, configure_extensions, configure_cors
 from .mail_config import configure_mail
+from .cli_config import register_commands
 
 def configure_application(app):
     """Configurar toda la aplicación Flask con todas las configuraciones"""
@@ -14,5 +15,6 @@ def configure_application(app):
     configure_cors(app)
     register_blueprints(app)
     configure_mail(app)
+    register_commands(app)
 
 __all__ = ['configure_application']
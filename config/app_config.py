@@ -8,7 +8,8 @@ def configure_app(app):
     
     app.config['SECRET_KEY'] = os.getenv('CLERK_SECRET_KEY')
     app.config['CLERK_API_KEY'] = os.getenv('CLERK_SECRET_KEY') 
-    db_uri = f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}?charset=utf8mb4&collation=utf8mb4_general_ci"
+    # DATABASE_URL permite apuntar a otra base (p. ej. sqlite:///habitos_local.db para pruebas locales)
+    db_uri = os.getenv('DATABASE_URL') or f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}?charset=utf8mb4&collation=utf8mb4_general_ci"
     
     app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -20,8 +21,24 @@ def configure_app(app):
     app.config['CLERK_JWKS_URL'] = os.getenv('CLERK_JWKS_URL')
     app.config['CLERK_JWT_TEMPLATE_ID'] = os.getenv('CLERK_JWT_TEMPLATE_ID')
     app.config['CLERK_API_BASE'] = os.getenv('CLERK_API_BASE')
+    app.config['CLERK_JWKS_CACHE_TTL'] = int(os.getenv('CLERK_JWKS_CACHE_TTL', '3600'))
+    app.config['CLERK_JWKS_MIN_REFRESH'] = int(os.getenv('CLERK_JWKS_MIN_REFRESH', '60'))
+    app.config['CLERK_JWT_LEEWAY'] = int(os.getenv('CLERK_JWT_LEEWAY', '5'))
+    app.config['CLERK_HTTP_TIMEOUT'] = float(os.getenv('CLERK_HTTP_TIMEOUT', '5'))
+    app.config['CLERK_PROFILE_CACHE_SIZE'] = int(os.getenv('CLERK_PROFILE_CACHE_SIZE', '5000'))
+    app.config['CLERK_PROFILE_CACHE_TTL'] = int(os.getenv('CLERK_PROFILE_CACHE_TTL', '300'))
+    app.config['CLERK_PROFILE_NEGATIVE_TTL'] = int(os.getenv('CLERK_PROFILE_NEGATIVE_TTL', '60'))
+    app.config['AUTH_TOKEN_CACHE_SIZE'] = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+    app.config['AUTH_TOKEN_CACHE_TTL'] = int(os.getenv('AUTH_TOKEN_CACHE_TTL', '300'))
     app.config['TIMEZONE_DEFAULT'] = os.getenv('TIMEZONE_DEFAULT', 'UTC')
     app.config['DEFAULT_CLOSURE_HOUR'] = int(os.getenv('DEFAULT_CLOSURE_HOUR', '0')) 
+    app.config['STREAK_ROLLOVER_ENABLED'] = os.getenv('STREAK_ROLLOVER_ENABLED', 'False').lower() == 'true'
+    app.config['GROUP_LEADERBOARD_CACHE_SIZE'] = int(os.getenv('GROUP_LEADERBOARD_CACHE_SIZE', '1000'))
+    app.config['GROUP_LEADERBOARD_CACHE_TTL'] = int(os.getenv('GROUP_LEADERBOARD_CACHE_TTL', '300'))
+    app.config['ENTRIES_BATCH_MAX'] = int(os.getenv('ENTRIES_BATCH_MAX', '500'))
+    app.config['INVITES_BATCH_MAX'] = int(os.getenv('INVITES_BATCH_MAX', '100'))
+    app.config['REPORTS_USE_DAILY_ROLLUP'] = os.getenv('REPORTS_USE_DAILY_ROLLUP', 'False').lower() == 'true'
+    app.config['STREAK_ROLLOVER_BATCH_SIZE'] = int(os.getenv('STREAK_ROLLOVER_BATCH_SIZE', '500'))
     
     app.config['JSON_AS_ASCII'] = False
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 
@@ -0,0 +1,122 @@
+import click
+from flask.cli import AppGroup
+
+streaks_cli = AppGroup('streaks', help='Tareas programadas de rachas')
+
+@streaks_cli.command('rollover')
+@click.option('--batch-size', type=int, default=None, help='Rachas activas por lote (por defecto STREAK_ROLLOVER_BATCH_SIZE)')
+def streaks_rollover(batch_size):
+    """Cerrar el día de las rachas de cada zona horaria cuyo día local ya cambió"""
+    from services.streak_rollover_service import run_rollover
+    totals = run_rollover(batch_size=batch_size)
+    click.echo(
+        f"Grupos: {totals['grupos']}, rachas revisadas: {totals['revisadas']}, "
+        f"rotas: {totals['rotas']}, fallos automáticos: {totals['fallos_automaticos']}"
+    )
+
+@streaks_cli.command('rebuild-runs')
+@click.option('--habit-id', default=None, help='Reconstruir solo un hábito')
+def streaks_rebuild_runs(habit_id):
+    """Reconstruir los tramos de racha y la mejor racha desde el historial de registros"""
+    from services.streak_runs_service import rebuild_runs
+    totals = rebuild_runs(habit_id=habit_id)
+    click.echo(f"Tramos creados: {totals['tramos']}, rachas actualizadas: {totals['rachas']}")
+
+counters_cli = AppGroup('counters', help='Mantenimiento de contadores de registros')
+
+@counters_cli.command('rebuild')
+@click.option('--habit-id', default=None, help='Reconstruir solo un hábito')
+def counters_rebuild(habit_id):
+    """Reconstruir habito_contadores desde el historial de registros"""
+    from services.entry_stats_service import rebuild_counters
+    total = rebuild_counters(habit_id=habit_id)
+    click.echo(f"Contadores creados: {total}")
+
+mail_cli = AppGroup('mail', help='Envío de correo saliente')
+
+@mail_cli.command('send-outbox')
+@click.option('--batch-size', type=int, default=None, help='Correos por lote (por defecto MAIL_OUTBOX_BATCH_SIZE)')
+@click.option('--loop', is_flag=True, help='Seguir enviando en bucle en lugar de salir al vaciar la cola')
+@click.option('--interval', type=float, default=10, show_default=True, help='Segundos entre pasadas con --loop')
+def mail_send_outbox(batch_size, loop, interval):
+    """Enviar los correos pendientes de correo_salida reutilizando una conexión SMTP por lote"""
+    import time
+    from services.mail_outbox_service import send_outbox
+    while True:
+        totals = send_outbox(batch_size=batch_size)
+        if totals['lotes'] or not loop:
+            click.echo(
+                f"Lotes: {totals['lotes']}, enviados: {totals['enviados']}, "
+                f"reintentos: {totals['reintentos']}, fallidos: {totals['fallidos']}"
+            )
+        if not loop:
+            break
+        time.sleep(interval)
+
+@mail_cli.command('bench-invitations')
+@click.option('--count', type=int, default=2000, show_default=True, help='Invitaciones a renderizar')
+def mail_bench_invitations(count):
+    """Medir invitaciones renderizadas por segundo: render_template completo frente al renderizador en caché"""
+    import secrets
+    import time
+    from flask import render_template
+    from services.email_service import get_group_invitation_renderer
+    invitation_data = {
+        'invitador_nombre': 'Ana',
+        'nombre_grupo': 'Grupo de prueba',
+        'descripcion_grupo': 'Grupo para medir el renderizado de invitaciones'
+    }
+    urls = [f"https://habitos.cvpx.lat/join-group?token={secrets.token_hex(32)}" for _ in range(count)]
+
+    started = time.perf_counter()
+    for url in urls:
+        render_template('email/group_invitation.html', url_aceptar=url, **invitation_data)
+    full = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for url in urls:
+        get_group_invitation_renderer(invitation_data)(url)
+    cached = time.perf_counter() - started
+
+    click.echo(f"render_template: {count / full:,.0f} invitaciones/s")
+    click.echo(f"renderizador en caché: {count / cached:,.0f} invitaciones/s ({full / cached:.1f}x)")
+
+invites_cli = AppGroup('invites', help='Mantenimiento de invitaciones a grupos')
+
+@invites_cli.command('expire')
+def invites_expire():
+    """Marcar como expiradas las invitaciones pendientes ya vencidas"""
+    from services.invite_service import expire_pending_invites
+    total = expire_pending_invites()
+    click.echo(f"Invitaciones expiradas: {total}")
+
+reports_cli = AppGroup('reports', help='Mantenimiento del resumen diario de reportes')
+
+@reports_cli.command('backfill')
+@click.option('--user-id', default=None, help='Reconstruir solo un usuario')
+def reports_backfill(user_id):
+    """Reconstruir registro_resumen_diario desde el historial de registros"""
+    from services.daily_rollup_service import backfill_daily_rollup
+    total = backfill_daily_rollup(user_id=user_id)
+    click.echo(f"Días resumidos: {total}")
+
+@reports_cli.command('check')
+@click.option('--user-id', default=None, help='Comprobar solo un usuario')
+@click.option('--limit', type=int, default=100, show_default=True, help='Máximo de diferencias a mostrar por tipo')
+def reports_check(user_id, limit):
+    """Comparar registro_resumen_diario con los registros; sale con código 1 si hay diferencias"""
+    from services.daily_rollup_service import check_daily_rollup
+    differences = check_daily_rollup(user_id=user_id, limit=limit)
+    for diff in differences:
+        click.echo(f"{diff['id_clerk']} {diff['fecha'].isoformat()}: esperado {diff['esperado']}, resumen {diff['actual']}")
+    click.echo(f"Diferencias: {len(differences)}")
+    if differences:
+        raise SystemExit(1)
+
+def register_commands(app):
+    """Registrar los comandos CLI de la aplicación (`flask <grupo> <comando>`)"""
+    app.cli.add_command(streaks_cli)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(mail_cli)
+    app.cli.add_command(invites_cli)
+    app.cli.add_command(reports_cli)
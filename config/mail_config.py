@@ -6,12 +6,17 @@ mail = Mail()
 def configure_mail(app):
     """Configurar servicio de correo electrónico"""
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
-    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT'))
-    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS').lower() == 'true'
-    app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL').lower() == 'true'
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', '25'))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'False').lower() == 'true'
+    app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', 'False').lower() == 'true'
     app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
     app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
+    app.config['MAIL_OUTBOX_BATCH_SIZE'] = int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', '50'))
+    app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+    app.config['MAIL_OUTBOX_RETRY_BASE_SECONDS'] = int(os.getenv('MAIL_OUTBOX_RETRY_BASE_SECONDS', '60'))
+    app.config['MAIL_OUTBOX_RETRY_MAX_SECONDS'] = int(os.getenv('MAIL_OUTBOX_RETRY_MAX_SECONDS', '3600'))
+    app.config['MAIL_OUTBOX_LEASE_SECONDS'] = int(os.getenv('MAIL_OUTBOX_LEASE_SECONDS', '300'))
 
     mail.init_app(app)
     
@@ -1,8 +1,13 @@
 from flask import request, jsonify, g, current_app
 from models import db, Group, GroupMember, GroupInvite, User
+from sqlalchemy import and_, func
+from sqlalchemy.orm import aliased
 from services.auth_service import auth_required
 from services.subscription_service import check_group_access
-from services.email_service import send_group_invitation
+from services.email_service import enqueue_group_invitation
+from services.invite_service import normalize_invite_emails, create_invites_bulk
+from services.leaderboard_service import LEADERBOARD_PERIODS, load_group_leaderboard, invalidate_group_leaderboard
+from services.timezone_service import get_user_local_date
 import uuid
 from datetime import datetime, timedelta
 import secrets
@@ -13,24 +18,33 @@ logger = logging.getLogger(__name__)
 @auth_required
 def get_groups():
     """Obtener grupos del usuario"""
-    groups = db.session.query(Group).join(GroupMember).filter(
-        GroupMember.id_clerk == g.current_user.id_clerk
+    # Una consulta: columnas del grupo, rol del usuario y conteo de miembros agrupado
+    my_membership = aliased(GroupMember)
+    members = aliased(GroupMember)
+    rows = db.session.query(
+        Group.id,
+        Group.nombre,
+        Group.descripcion,
+        my_membership.rol,
+        func.count(members.id_clerk).label('miembros_count')
+    ).join(
+        my_membership, and_(
+            my_membership.id_grupo == Group.id,
+            my_membership.id_clerk == g.current_user.id_clerk
+        )
+    ).join(
+        members, members.id_grupo == Group.id
+    ).group_by(
+        Group.id, Group.nombre, Group.descripcion, my_membership.rol
     ).all()
     
-    result = []
-    for group in groups:
-        member = GroupMember.query.filter_by(
-            id_grupo=group.id,
-            id_clerk=g.current_user.id_clerk
-        ).first()
-        
-        result.append({
-            'id': group.id,
-            'nombre': group.nombre,
-            'descripcion': group.descripcion,
-            'miembros_count': len(group.members),
-            'soy_rol': member.rol if member else 'miembro'
-        })
+    result = [{
+        'id': row.id,
+        'nombre': row.nombre,
+        'descripcion': row.descripcion,
+        'miembros_count': row.miembros_count,
+        'soy_rol': row.rol or 'miembro'
+    } for row in rows]
     
     return jsonify(result)
 
@@ -98,6 +112,31 @@ def get_group(group_id):
         'miembros': members_data
     })
 
+@auth_required
+def get_group_leaderboard(group_id):
+    """Ranking de miembros del grupo por tasa de éxito y racha actual (?period=week|month)"""
+    group = Group.query.get_or_404(group_id)
+    member = GroupMember.query.filter_by(
+        id_grupo=group_id,
+        id_clerk=g.current_user.id_clerk
+    ).first()
+    
+    if not member:
+        return jsonify({'error': {'code': 'forbidden', 'message': 'Sin acceso al grupo'}}), 403
+    
+    period = request.args.get('period', 'week')
+    if period not in LEADERBOARD_PERIODS:
+        return jsonify({'error': {'code': 'validation_error', 'message': 'period debe ser "week" o "month"'}}), 422
+    
+    leaderboard = load_group_leaderboard(group_id, period, get_user_local_date(g.current_user.id_clerk))
+    
+    return jsonify({
+        'id_grupo': group.id,
+        'nombre': group.nombre,
+        'periodo': period,
+        **leaderboard
+    })
+
 @auth_required
 def update_group(group_id):
     """Actualizar información de un grupo"""
@@ -198,6 +237,7 @@ def add_member(group_id):
     
     db.session.add(new_member)
     db.session.commit()
+    invalidate_group_leaderboard(group_id)
     
     return jsonify({
         'id_grupo': group_id,
@@ -230,6 +270,7 @@ def remove_member(group_id, member_id):
     
     db.session.delete(member_to_remove)
     db.session.commit()
+    invalidate_group_leaderboard(group_id)
     
     return jsonify({'ok': True})
 
@@ -307,6 +348,7 @@ def leave_group(group_id):
     # Eliminar al miembro del grupo
     db.session.delete(member)
     db.session.commit()
+    invalidate_group_leaderboard(group_id)
     
     return jsonify({'ok': True, 'message': 'Has abandonado el grupo exitosamente'})
 
@@ -317,23 +359,24 @@ def verify_invitation():
     if not token:
         return jsonify({'error': {'code': 'validation_error', 'message': 'Token de invitación requerido'}}), 422
     
-    invitacion = GroupInvite.query.filter_by(token=token).first()
+    # Invitación, grupo e invitador en una sola consulta
+    row = db.session.query(GroupInvite, Group, User).join(
+        Group, Group.id == GroupInvite.id_grupo
+    ).join(
+        User, User.id_clerk == GroupInvite.id_invitador
+    ).filter(GroupInvite.token == token).first()
     
-    if not invitacion:
+    if not row:
         return jsonify({'error': {'code': 'not_found', 'message': 'Invitación no encontrada'}}), 404
+    invitacion, group, invitador = row
     
     if invitacion.estado != 'pendiente':
         return jsonify({'error': {'code': 'invalid_status', 'message': f'La invitación está {invitacion.estado}'}}), 400
     
+    # Solo lectura: el cambio a 'expirada' lo hace `flask invites expire`
     if invitacion.expira_en < datetime.utcnow():
-        invitacion.estado = 'expirada'
-        db.session.commit()
         return jsonify({'error': {'code': 'expired', 'message': 'La invitación ha expirado'}}), 400
     
-    # Obtener información del grupo y del invitador
-    group = Group.query.get(invitacion.id_grupo)
-    invitador = User.query.filter_by(id_clerk=invitacion.id_invitador).first()
-    
     return jsonify({
         'invitation': {
             'id': invitacion.id,
@@ -400,8 +443,6 @@ def accept_invite():
         return jsonify({'error': {'code': 'invalid_status', 'message': f'La invitación está {invitacion.estado}'}}), 400
     
     if invitacion.expira_en < datetime.utcnow():
-        invitacion.estado = 'expirada'
-        db.session.commit()
         return jsonify({'error': {'code': 'expired', 'message': 'La invitación ha expirado'}}), 400
     
     # Verificar si el usuario ya es miembro
@@ -425,6 +466,7 @@ def accept_invite():
     
     db.session.add(new_member)
     db.session.commit()
+    invalidate_group_leaderboard(invitacion.id_grupo)
     
     # Obtener información del grupo
     group = Group.query.get(invitacion.id_grupo)
@@ -435,40 +477,31 @@ def accept_invite():
         'rol': invitacion.rol
     }), 200
 
-@auth_required
 @auth_required
 def get_invites():
-    """Obtener todas las invitaciones del usuario por correo electrónico"""
-    # Obtener las invitaciones por correo del usuario actual
-    user_email = g.current_user.email
-    
-    invitations = GroupInvite.query.filter_by(
-        correo_invitado=user_email,
-        estado='pendiente'
+    """Obtener todas las invitaciones pendientes del usuario por correo electrónico"""
+    # Invitaciones vigentes con el nombre del grupo en una sola consulta
+    rows = db.session.query(GroupInvite, Group.nombre).outerjoin(
+        Group, Group.id == GroupInvite.id_grupo
+    ).filter(
+        GroupInvite.correo_invitado == g.current_user.correo,
+        GroupInvite.estado == 'pendiente',
+        GroupInvite.expira_en >= datetime.utcnow()
     ).all()
     
     result = []
-    for invite in invitations:
-        if invite.expira_en < datetime.utcnow():
-            invite.estado = 'expirada'
-            continue
-            
-        group = Group.query.get(invite.id_grupo)
+    for invite, nombre_grupo in rows:
         result.append({
             'id': invite.id,
             'token': invite.token,
             'id_grupo': invite.id_grupo,
-            'nombre_grupo': group.nombre if group else "Grupo desconocido",
+            'nombre_grupo': nombre_grupo or "Grupo desconocido",
             'invitador': invite.id_invitador,
             'rol': invite.rol,
             'fecha_creacion': invite.fecha_creacion.isoformat(),
             'expira_en': invite.expira_en.isoformat()
         })
     
-    # Si hubo cambios de estado por expiración, guardarlos
-    if any(inv.estado == 'expirada' for inv in invitations if inv not in result):
-        db.session.commit()
-    
     return jsonify(result)
 
 @auth_required
@@ -487,13 +520,16 @@ def get_group_invites(group_id):
         id_grupo=group_id
     ).all()
     
+    now = datetime.utcnow()
     result = []
     for invite in invitations:
+        # Las vencidas que el barrido aún no ha marcado se muestran ya como expiradas
+        expired = invite.estado == 'pendiente' and invite.expira_en < now
         result.append({
             'id': invite.id,
             'correo_invitado': invite.correo_invitado,
             'rol': invite.rol,
-            'estado': invite.estado,
+            'estado': 'expirada' if expired else invite.estado,
             'fecha_creacion': invite.fecha_creacion.isoformat(),
             'expira_en': invite.expira_en.isoformat()
         })
@@ -526,8 +562,8 @@ def create_invite(group_id):
     # Si se proporciona un ID de usuario, obtener su correo
     if id_usuario_existente:
         user = User.query.filter_by(id_clerk=id_usuario_existente).first()
-        if user and user.email:
-            correo_invitado = user.email
+        if user and user.correo:
+            correo_invitado = user.correo
         else:
             return jsonify({'error': {'code': 'user_not_found', 'message': 'No se encontró el correo del usuario'}}), 404
     
@@ -563,7 +599,7 @@ def create_invite(group_id):
         )
         db.session.add(notificacion)
     
-    # Enviar correo electrónico
+    # Encolar correo electrónico (se envía con `flask mail send-outbox` tras el commit)
     try:
         # Obtener información del invitador
         invitador = User.query.filter_by(id_clerk=g.current_user.id_clerk).first()
@@ -578,12 +614,10 @@ def create_invite(group_id):
             'url_base': current_app.config.get('FRONTEND_URL', 'https://habitos.cvpx.lat')
         }
         
-        # Enviar correo
-        sent = send_group_invitation(correo_invitado, invitation_data)
-        if not sent:
-            logger.warning(f"No se pudo enviar el correo de invitación a {correo_invitado}")
+        # Encolar correo
+        enqueue_group_invitation(correo_invitado, invitation_data, invitacion.id)
     except Exception as e:
-        logger.error(f"Error al enviar invitación por correo: {str(e)}")
+        logger.error(f"Error al encolar invitación por correo: {str(e)}")
     
     db.session.commit()
     
@@ -616,73 +650,25 @@ def create_batch_invites(group_id):
     if not correos or not isinstance(correos, list) or len(correos) == 0:
         return jsonify({'error': {'code': 'validation_error', 'message': 'Se requiere una lista de correos'}}), 422
     
-    # Limitar el número de invitaciones por solicitud
-    max_invites = min(len(correos), 20)  # Máximo 20 invitaciones por solicitud
+    max_invites = current_app.config['INVITES_BATCH_MAX']
+    if len(correos) > max_invites:
+        return jsonify({'error': {'code': 'validation_error', 'message': f'Máximo {max_invites} invitaciones por solicitud'}}), 422
     
-    invitaciones = []
-    errores = []
+    correos, errores = normalize_invite_emails(correos)
     
     # Obtener información del invitador para correos
     invitador = User.query.filter_by(id_clerk=g.current_user.id_clerk).first()
-    invitador_nombre = invitador.nombre_completo if invitador and hasattr(invitador, 'nombre_completo') else "Un usuario"
-    
-    for i in range(max_invites):
-        correo_invitado = correos[i]
-        
-        if not correo_invitado or not isinstance(correo_invitado, str):
-            errores.append({
-                'correo': correo_invitado,
-                'error': 'Formato de correo inválido'
-            })
-            continue
-            
-        try:
-            token = secrets.token_hex(32)
-            
-            invitacion = GroupInvite(
-                id_grupo=group_id,
-                id_invitador=g.current_user.id_clerk,
-                correo_invitado=correo_invitado,
-                token=token,
-                estado='pendiente',
-                expira_en=datetime.utcnow() + timedelta(days=7),
-                rol=rol
-            )
-            
-            db.session.add(invitacion)
-            db.session.flush()  # Para obtener el ID de la invitación
-            
-            # Datos para la invitación por correo
-            invitation_data = {
-                'invitador_nombre': invitador_nombre,
-                'nombre_grupo': group.nombre,
-                'descripcion_grupo': group.descripcion or "Sin descripción",
-                'token': token,
-                'url_base': current_app.config.get('FRONTEND_URL', 'https://habitos.cvpx.lat')
-            }
-            
-            # Intentar enviar correo
-            try:
-                sent = send_group_invitation(correo_invitado, invitation_data)
-                if not sent:
-                    logger.warning(f"No se pudo enviar el correo de invitación a {correo_invitado}")
-            except Exception as e:
-                logger.error(f"Error al enviar invitación por correo a {correo_invitado}: {str(e)}")
-            
-            invitaciones.append({
-                'id': invitacion.id,
-                'token': invitacion.token,
-                'correo_invitado': correo_invitado,
-                'expira_en': invitacion.expira_en.isoformat()
-            })
-            
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Error al crear invitación para {correo_invitado}: {str(e)}")
-            errores.append({
-                'correo': correo_invitado,
-                'error': 'Error interno al crear la invitación'
-            })
+    invitador_nombre = invitador.nombre_completo if invitador and invitador.nombre_completo else "Un usuario"
+    
+    invitaciones, omitidos = create_invites_bulk(
+        group,
+        g.current_user.id_clerk,
+        invitador_nombre,
+        correos,
+        rol,
+        current_app.config.get('FRONTEND_URL', 'https://habitos.cvpx.lat')
+    )
+    errores.extend(omitidos)
     
     try:
         db.session.commit()
@@ -1,7 +1,10 @@
 from flask import request, jsonify, g, current_app
-from models import db, Habit, Group, GroupMember, HabitEntry
+from models import db, Habit, Group, GroupMember
 from services.auth_service import auth_required
-from services.habit_service import calculate_streak
+from services.habit_service import load_habits_with_streaks, load_habits_page_by_cursor, get_today_entries
+from core.pagination import CursorError
+from services.group_stats_service import load_group_members, get_members_progress
+from services.leaderboard_service import invalidate_group_leaderboard
 from services.timezone_service import get_user_local_date
 import uuid
 from datetime import datetime
@@ -37,6 +40,7 @@ def create_group_habit(group_id):
     
     db.session.add(habit)
     db.session.commit()
+    invalidate_group_leaderboard(group_id)
     
     return jsonify({
         'id': habit.id,
@@ -105,32 +109,29 @@ def get_group_habits_for_user():
     elif estado == 'archivados':
         query = query.filter(Habit.archivado == True)
     
-    # Debug - Obtener la consulta SQL generada
-    sql_statement = str(query.statement.compile(
-        compile_kwargs={"literal_binds": True}
-    ))
-    current_app.logger.info(f"SQL generado: {sql_statement}")
-    
-    habits = query.offset((page - 1) * limit).limit(limit).all()
-    current_app.logger.info(f"Se encontraron {len(habits)} hábitos grupales")
-    
-    if habits:
-        habit_ids = [h.id for h in habits]
-        current_app.logger.info(f"IDs de hábitos grupales encontrados: {habit_ids}")
-    
     hoy_local = get_user_local_date(g.current_user.id_clerk)
+    # Con ?cursor= se pagina por (fecha_creacion, id); sin él se mantiene page/limit
+    use_cursor = 'cursor' in request.args
+    next_cursor = None
+    if use_cursor:
+        try:
+            habits, rachas_por_habito, next_cursor = load_habits_page_by_cursor(
+                query, g.current_user.id_clerk, request.args.get('cursor'), limit
+            )
+        except CursorError:
+            return jsonify({'error': {'code': 'validation_error', 'message': 'Cursor inválido'}}), 422
+    else:
+        habits, rachas_por_habito = load_habits_with_streaks(
+            query.offset((page - 1) * limit).limit(limit),
+            g.current_user.id_clerk
+        )
+    registros_hoy = get_today_entries(g.current_user.id_clerk, [habit.id for habit in habits], hoy_local)
+    current_app.logger.info(f"Se encontraron {len(habits)} hábitos grupales")
     
     result = []
     for habit in habits:
-        current_app.logger.info(f"Procesando hábito grupal: {habit.id}, grupo: {habit.id_grupo}")
-        
-        rachas = calculate_streak(habit.id, g.current_user.id_clerk)
-        
-        registro_hoy = HabitEntry.query.filter_by(
-            id_habito=habit.id,
-            id_clerk=g.current_user.id_clerk,
-            fecha=hoy_local
-        ).first()
+        rachas = rachas_por_habito[habit.id]
+        registro_hoy = registros_hoy.get(habit.id)
         
         habit_data = {
             'id': habit.id,
@@ -154,6 +155,8 @@ def get_group_habits_for_user():
         
         result.append(habit_data)
     
+    if use_cursor:
+        return jsonify({'habitos': result, 'next_cursor': next_cursor})
     return jsonify(result)
 
 @auth_required
@@ -179,11 +182,22 @@ def get_group_habit_details(habit_id):
     # Obtener información del grupo
     group = Group.query.get(habit.id_grupo)
     
-    # Obtener todos los miembros del grupo
-    group_members = GroupMember.query.filter_by(id_grupo=habit.id_grupo).all()
+    # Miembros con su usuario en una consulta; con ?members_limit= se paginan por id_clerk
+    members_limit = request.args.get('members_limit', type=int)
+    if members_limit is not None:
+        members_limit = max(1, min(members_limit, 100))
+    try:
+        group_members, members_next_cursor = load_group_members(
+            habit.id_grupo,
+            limit=members_limit,
+            cursor=request.args.get('members_cursor')
+        )
+    except CursorError:
+        return jsonify({'error': {'code': 'validation_error', 'message': 'Cursor inválido'}}), 422
     
     # Obtener la fecha local del usuario actual
-    hoy_local = get_user_local_date(g.current_user.id_clerk)
+    user_id = g.current_user.id_clerk
+    hoy_local = get_user_local_date(user_id)
     
     # Información básica del hábito
     result = {
@@ -199,89 +213,24 @@ def get_group_habit_details(habit_id):
             'nombre': group.nombre,
             'descripcion': group.descripcion
         },
-        'mi_rol_en_grupo': member.rol,
-        
-        # Mi propio progreso
-        'mi_progreso': get_user_progress_for_habit(habit.id, g.current_user.id_clerk, hoy_local),
-        
-        # Progreso de todos los miembros
-        'progreso_miembros': []
+        'mi_rol_en_grupo': member.rol
     }
     
-    # Añadir progreso de cada miembro
-    for group_member in group_members:
-        # Obtener usuario
-        from models import User
-        user = User.query.get(group_member.id_clerk)
-        
-        # Progreso del miembro
-        member_progress = get_user_progress_for_habit(habit.id, group_member.id_clerk, hoy_local)
-        
-        result['progreso_miembros'].append({
-            'id_clerk': group_member.id_clerk,
-            'nombre': user.nombre_completo,
-            'rol': group_member.rol,
-            'progreso': member_progress
-        })
+    # Progreso de todos los miembros (y el propio) con un número fijo de consultas
+    progress = get_members_progress(habit.id, group_members + [g.current_user], hoy_local)
     
-    return jsonify(result)
-
-def get_user_progress_for_habit(habit_id, user_id, fecha_local):
-    """
-    Obtener el progreso de un usuario específico para un hábito
-    """
-    # Rachas
-    rachas = calculate_streak(habit_id, user_id)
-    
-    # Registro de hoy
-    registro_hoy = HabitEntry.query.filter_by(
-        id_habito=habit_id,
-        id_clerk=user_id,
-        fecha=fecha_local
-    ).first()
+    # Mi propio progreso
+    result['mi_progreso'] = progress[user_id]
     
-    # Total de registros
-    total_registros = HabitEntry.query.filter_by(
-        id_habito=habit_id,
-        id_clerk=user_id
-    ).count()
-    
-    # Éxitos y fallos
-    total_exitos = HabitEntry.query.filter_by(
-        id_habito=habit_id,
-        id_clerk=user_id,
-        estado='exito'
-    ).count()
-    
-    total_fallos = HabitEntry.query.filter_by(
-        id_habito=habit_id,
-        id_clerk=user_id,
-        estado='fallo'
-    ).count()
-    
-    # Calcular tasa de éxito
-    tasa_exito = (total_exitos / total_registros * 100) if total_registros > 0 else 0
-    
-    # Registros recientes
-    registros_recientes = HabitEntry.query.filter_by(
-        id_habito=habit_id,
-        id_clerk=user_id
-    ).order_by(HabitEntry.fecha.desc()).limit(5).all()
-    
-    return {
-        'rachas': rachas,
-        'total_registros': total_registros,
-        'total_exitos': total_exitos,
-        'total_fallos': total_fallos,
-        'tasa_exito': round(tasa_exito, 1),
-        'registro_hoy': {
-            'completado': registro_hoy is not None,
-            'estado': registro_hoy.estado if registro_hoy else None,
-            'comentario': registro_hoy.comentario if registro_hoy else None
-        },
-        'registros_recientes': [{
-            'fecha': entry.fecha.isoformat(),
-            'estado': entry.estado,
-            'comentario': entry.comentario
-        } for entry in registros_recientes]
-    }
+    # Progreso de todos los miembros
+    result['progreso_miembros'] = [{
+        'id_clerk': group_member.id_clerk,
+        'nombre': group_member.nombre_completo,
+        'rol': group_member.rol,
+        'progreso': progress[group_member.id_clerk]
+    } for group_member in group_members]
+    
+    if members_limit is not None:
+        result['miembros_next_cursor'] = members_next_cursor
+    
+    return jsonify(result)
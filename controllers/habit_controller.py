@@ -1,16 +1,19 @@
-from services.timezone_service import format_datetime, to_user_timezone, get_user_local_date
+from services.timezone_service import format_datetime, to_user_timezone, get_user_local_date, get_user_time_context
 from flask import request, jsonify, g, current_app
 from models import db, Habit, HabitEntry, HabitStreak, GroupMember
 from services.auth_service import auth_required
 from services.date_service import parse_date
-from services.habit_service import calculate_streak, update_streak_on_entry, user_has_access_to_habit, can_edit_habit, get_habit_recent_entries
+from services.habit_service import calculate_streak, apply_streak_changes, get_accessible_habit_ids, load_habits_with_streaks, load_habits_page_by_cursor, get_entry_summaries, get_today_entries, update_streak_on_entry, update_streak_on_removal, user_has_access_to_habit, can_edit_habit, get_habit_recent_entries
 from sqlalchemy import or_, text
-import uuid
 from datetime import timedelta
-from datetime import datetime
+from datetime import datetime, date
 import pytz
 
 from services.subscription_service import check_habit_limit
+from services.entry_service import upsert_habit_entry, upsert_habit_entries, remove_habit_entry
+from services.entry_stats_service import get_entry_count
+from services.daily_rollup_service import remove_habit_from_rollup
+from core.pagination import CursorError, decode_cursor, keyset_filter, split_page
 
 @auth_required
 def get_habits():
@@ -50,12 +53,6 @@ def get_habits():
                     Habit.id_grupo.in_(group_ids)
                 )
             )
-            
-            # Debug - Obtener la consulta SQL generada
-            sql_statement = str(query.statement.compile(
-                compile_kwargs={"literal_binds": True}
-            ))
-            current_app.logger.info(f"SQL generado: {sql_statement}")
     
     if tipo:
         query = query.filter(Habit.tipo == tipo)
@@ -65,7 +62,23 @@ def get_habits():
     elif estado == 'archivados':
         query = query.filter(Habit.archivado == True)
     
-    habits = query.offset((page - 1) * limit).limit(limit).all()
+    hoy_local = get_user_local_date(g.current_user.id_clerk)
+    # Con ?cursor= se pagina por (fecha_creacion, id); sin él se mantiene page/limit
+    use_cursor = 'cursor' in request.args
+    next_cursor = None
+    if use_cursor:
+        try:
+            habits, rachas_por_habito, next_cursor = load_habits_page_by_cursor(
+                query, g.current_user.id_clerk, request.args.get('cursor'), limit
+            )
+        except CursorError:
+            return jsonify({'error': {'code': 'validation_error', 'message': 'Cursor inválido'}}), 422
+    else:
+        habits, rachas_por_habito = load_habits_with_streaks(
+            query.offset((page - 1) * limit).limit(limit),
+            g.current_user.id_clerk
+        )
+    registros_hoy = get_today_entries(g.current_user.id_clerk, [habit.id for habit in habits], hoy_local)
     
     current_app.logger.info(f"Se encontraron {len(habits)} hábitos en total")
     
@@ -77,20 +90,10 @@ def get_habits():
         group_habit_ids = [h.id for h in habits if h.id_grupo is not None]
         current_app.logger.info(f"IDs de hábitos grupales encontrados: {group_habit_ids}")
     
-    hoy_local = get_user_local_date(g.current_user.id_clerk)
-    
     result = []
     for habit in habits:
-        # Registrar cada hábito para depuración
-        current_app.logger.info(f"Procesando hábito: {habit.id}, es_grupal: {habit.id_grupo is not None}")
-        
-        rachas = calculate_streak(habit.id, g.current_user.id_clerk)
-
-        registro_hoy = HabitEntry.query.filter_by(
-            id_habito=habit.id,
-            id_clerk=g.current_user.id_clerk,
-            fecha=hoy_local
-        ).first()
+        rachas = rachas_por_habito[habit.id]
+        registro_hoy = registros_hoy.get(habit.id)
         
         habit_data = {
             'id': habit.id,
@@ -116,6 +119,8 @@ def get_habits():
         
         result.append(habit_data)
     
+    if use_cursor:
+        return jsonify({'habitos': result, 'next_cursor': next_cursor})
     return jsonify(result)
 
 @auth_required
@@ -207,22 +212,10 @@ def get_habit_details(habit_id):
     
     hoy_local = get_user_local_date(g.current_user.id_clerk)
     rachas = calculate_streak(habit.id, g.current_user.id_clerk)
-    total_registros = HabitEntry.query.filter_by(
-        id_habito=habit.id,
-        id_clerk=g.current_user.id_clerk
-    ).count()
-    
-    total_exitos = HabitEntry.query.filter_by(
-        id_habito=habit.id,
-        id_clerk=g.current_user.id_clerk,
-        estado='exito'
-    ).count()
-    
-    total_fallos = HabitEntry.query.filter_by(
-        id_habito=habit.id,
-        id_clerk=g.current_user.id_clerk,
-        estado='fallo'
-    ).count()
+    contadores = get_entry_count(habit.id, g.current_user.id_clerk)
+    total_registros = contadores.total
+    total_exitos = contadores.exitos
+    total_fallos = contadores.fallos
     
     tasa_exito = (total_exitos / total_registros * 100) if total_registros > 0 else 0
     
@@ -237,10 +230,12 @@ def get_habit_details(habit_id):
         fecha=hoy_local
     ).first()
     
+    # Búsqueda puntual por uniq_registro con la primera fecha del contador
     primer_registro = HabitEntry.query.filter_by(
         id_habito=habit.id,
-        id_clerk=g.current_user.id_clerk
-    ).order_by(HabitEntry.fecha.asc()).first()
+        id_clerk=g.current_user.id_clerk,
+        fecha=contadores.primera_fecha
+    ).first() if contadores.primera_fecha else None
 
     dias_desde_creacion = (hoy_local - habit.fecha_creacion.date()).days
     dias_desde_primer_registro = (hoy_local - primer_registro.fecha).days if primer_registro else None
@@ -376,7 +371,8 @@ def delete_habit(habit_id):
         # 1. Eliminar registros de rachas
         db.session.execute(text("DELETE FROM habito_rachas WHERE id_habito = :habit_id"), {"habit_id": habit_id})
         
-        # 2. Eliminar registros de entradas
+        # 2. Eliminar registros de entradas (descontándolos antes del resumen diario)
+        remove_habit_from_rollup(habit_id)
         db.session.execute(text("DELETE FROM habito_registros WHERE id_habito = :habit_id"), {"habit_id": habit_id})
         
         # 3. Finalmente eliminar el hábito
@@ -429,15 +425,33 @@ def get_habit_entries(habit_id):
         else:
             return jsonify({'error': {'code': 'validation_error', 'message': 'Formato de fecha "to" inválido'}}), 422
     
+    def serialize(entry):
+        return {
+            'id': entry.id,
+            'fecha': entry.fecha.isoformat(),
+            'estado': entry.estado,
+            'comentario': entry.comentario
+        }
+    
+    # Paginación por cursor (fecha, id) descendente, apoyada en idx_reg_habito_fecha
+    if 'cursor' in request.args:
+        try:
+            after = decode_cursor(request.args.get('cursor'), [date.fromisoformat, str])
+        except CursorError:
+            return jsonify({'error': {'code': 'validation_error', 'message': 'Cursor inválido'}}), 422
+        if after:
+            query = query.filter(keyset_filter([HabitEntry.fecha, HabitEntry.id], after, descending=True))
+        entries = query.order_by(HabitEntry.fecha.desc(), HabitEntry.id.desc()).limit(limit + 1).all()
+        entries, next_cursor = split_page(entries, limit, lambda entry: (entry.fecha, entry.id))
+        return jsonify({
+            'registros': [serialize(entry) for entry in entries],
+            'next_cursor': next_cursor
+        })
+    
     # Obtener registros con paginación
     entries = query.order_by(HabitEntry.fecha.desc()).offset((page - 1) * limit).limit(limit).all()
     
-    return jsonify([{
-        'id': entry.id,
-        'fecha': entry.fecha.isoformat(),
-        'estado': entry.estado,
-        'comentario': entry.comentario
-    } for entry in entries])
+    return jsonify([serialize(entry) for entry in entries])
 
 @auth_required
 def create_habit_entry(habit_id):
@@ -455,27 +469,11 @@ def create_habit_entry(habit_id):
         estado = 'fallo'
     comentario = data.get('comentario', '')
     
-    # Obtener zona horaria del usuario
+    # Fecha y hora local del usuario, ya ajustada según su hora de cierre del día
     user = g.current_user
-    user_tz = pytz.timezone(user.zona_horaria)
-    
-    # Obtener fecha y hora actual en UTC y convertirla a la zona horaria del usuario
-    now_utc = datetime.now(pytz.UTC)
-    now_user = now_utc.astimezone(user_tz)
-    
-    # Ajustar la fecha según la hora de cierre del día del usuario
-    fecha_registro = now_user.date()
-    if now_user.hour < user.cierre_dia_hora:
-        fecha_registro = fecha_registro - timedelta(days=1)
-    
-    print("Datos a procesar:", {
-        "estado": estado,
-        "comentario": comentario,
-        "zona_horaria": user.zona_horaria,
-        "hora_cierre": user.cierre_dia_hora,
-        "fecha_registro": fecha_registro,
-        "fecha_hora_local": now_user
-    })
+    time_context = get_user_time_context(user.id_clerk)
+    now_user = time_context.now_local
+    fecha_registro = time_context.today
     
     if not estado or estado not in ['exito', 'fallo']:
         return jsonify({'error': {'code': 'validation_error', 'message': 'Estado debe ser "exito" o "fallo"'}}), 422
@@ -506,62 +504,22 @@ def create_habit_entry(habit_id):
         }), 422
     
     try:
-        entry_id = str(uuid.uuid4())
-
-        fecha_hora_utc = now_user.astimezone(pytz.UTC)
-        
-        new_entry = HabitEntry(
-            id=entry_id,
-            id_habito=habit_id,
-            id_clerk=g.current_user.id_clerk,
-            fecha=fecha_registro, 
-            fecha_hora_local=fecha_hora_utc,  # Almacenar en UTC
-            estado=estado,
-            comentario=comentario
-        )
-        
-        db.session.add(new_entry)
-        db.session.flush() 
-
-        # Actualizar si ya existe
-        db.session.execute(
-            text("""
-                UPDATE habito_registros 
-                SET estado = :estado,
-                    comentario = :comentario,
-                    fecha_hora_local = :fecha_hora_local,
-                    fecha_actualizacion = NOW()
-                WHERE id_habito = :habit_id 
-                AND id_clerk = :user_id 
-                AND fecha = :fecha
-            """),
-            {
-                "habit_id": habit_id,
-                "user_id": g.current_user.id_clerk,
-                "fecha": fecha_registro,
-                "fecha_hora_local": fecha_hora_utc, 
-                "estado": estado,
-                "comentario": comentario
-            }
+        entry = upsert_habit_entry(
+            habit_id,
+            user.id_clerk,
+            fecha_registro,
+            estado,
+            comentario,
+            now_user.astimezone(pytz.UTC)  # Almacenar en UTC
         )
-        db.session.commit()
-        
-        entry = HabitEntry.query.get(entry_id)
-        if not entry:
-            entry = HabitEntry.query.filter_by(
-                id_habito=habit_id,
-                id_clerk=g.current_user.id_clerk,
-                fecha=fecha_registro
-            ).first()
-        
-        if not entry:
-            db.session.rollback()
-            return jsonify({'error': {'code': 'database_error', 'message': 'Error al recuperar el registro creado'}}), 500
+        rachas = update_streak_on_entry(habit_id, user.id_clerk, fecha_registro, estado, commit=False)
         
-        rachas = update_streak_on_entry(habit_id, g.current_user.id_clerk, fecha_registro, estado)
-        
-        fecha_hora_local = entry.fecha_hora_local.astimezone(user_tz)
+        fecha_hora_utc = entry.fecha_hora_local
+        if fecha_hora_utc.tzinfo is None:
+            fecha_hora_utc = pytz.UTC.localize(fecha_hora_utc)
+        fecha_hora_local = fecha_hora_utc.astimezone(time_context.tz)
         
+        # Se serializa antes del commit para no recargar el registro ni el usuario expirados
         response_data = {
             'id': entry.id,
             'fecha': fecha_hora_local.strftime('%d/%m/%Y'),
@@ -571,15 +529,129 @@ def create_habit_entry(habit_id):
             'rachas_usuario': rachas,
             'zona_horaria': user.zona_horaria 
         }
+        db.session.commit()
         
-        print("Respuesta a enviar:", response_data)
         return jsonify(response_data)
         
     except Exception as e:
         db.session.rollback()
-        print(f"Error creating habit entry: {e}")
+        current_app.logger.error(f"Error al guardar registro del hábito {habit_id}: {str(e)}")
         return jsonify({'error': {'code': 'database_error', 'message': 'Error al guardar el registro'}}), 500
 
+@auth_required
+def create_habit_entries_batch():
+    """
+    Registrar varios registros de hábitos en una sola petición (sincronización offline).
+    
+    Cuerpo: {"registros": [{"idempotency_key", "id_habito", "fecha", "estado", "comentario"}, ...]}
+    
+    Valida el acceso a todos los hábitos en una consulta, guarda los registros con un
+    único upsert multi-fila y recalcula la racha de cada hábito afectado una sola vez.
+    Si un mismo hábito y fecha aparece varias veces gana el último. Reenviar el mismo
+    lote es seguro: los registros se identifican por (hábito, usuario, fecha).
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('registros')
+    max_items = current_app.config['ENTRIES_BATCH_MAX']
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': {'code': 'validation_error', 'message': 'Se requiere una lista "registros" no vacía'}}), 422
+    if len(items) > max_items:
+        return jsonify({'error': {'code': 'validation_error', 'message': f'Máximo {max_items} registros por lote'}}), 422
+    
+    user_id = g.current_user.id_clerk
+    time_context = get_user_time_context(user_id)
+    fecha_hora_utc = time_context.now_local.astimezone(pytz.UTC)
+    
+    def rejected(key, code, message):
+        return {'idempotency_key': key, 'ok': False, 'error': {'code': code, 'message': message}}
+    
+    results = [None] * len(items)
+    rows = {}
+    indexes = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = rejected(None, 'validation_error', 'Cada registro debe ser un objeto')
+            continue
+        key = item.get('idempotency_key')
+        
+        habit_id = item.get('id_habito') or item.get('habit_id')
+        if not habit_id:
+            results[index] = rejected(key, 'validation_error', 'id_habito es requerido')
+            continue
+        if not isinstance(habit_id, str):
+            results[index] = rejected(key, 'validation_error', 'id_habito debe ser texto')
+            continue
+        
+        estado = item.get('estado')
+        estado = {'success': 'exito', 'failure': 'fallo'}.get(estado, estado) if isinstance(estado, str) else None
+        if estado not in ['exito', 'fallo']:
+            results[index] = rejected(key, 'validation_error', 'Estado debe ser "exito" o "fallo"')
+            continue
+        
+        comentario = item.get('comentario', '')
+        if comentario is not None and not isinstance(comentario, str):
+            results[index] = rejected(key, 'validation_error', 'comentario debe ser texto')
+            continue
+        
+        fecha = time_context.today
+        if item.get('fecha'):
+            try:
+                fecha = parse_date(item['fecha']).date()
+            except (ValueError, TypeError):
+                results[index] = rejected(key, 'validation_error', 'Formato de fecha inválido. Use YYYY-MM-DD')
+                continue
+            if fecha > time_context.today:
+                results[index] = rejected(key, 'validation_error', 'No se pueden registrar fechas futuras')
+                continue
+        
+        rows[(habit_id, fecha)] = {
+            'id_habito': habit_id,
+            'fecha': fecha,
+            'estado': estado,
+            'comentario': comentario,
+            'fecha_hora_local': fecha_hora_utc
+        }
+        indexes.setdefault((habit_id, fecha), []).append(index)
+    
+    accessible = get_accessible_habit_ids([habit_id for habit_id, _ in rows], user_id)
+    for row_key in [row_key for row_key in rows if row_key[0] not in accessible]:
+        for index in indexes.pop(row_key):
+            results[index] = rejected(items[index].get('idempotency_key'), 'forbidden', 'Sin acceso al hábito')
+        del rows[row_key]
+    
+    rachas = {}
+    try:
+        entries = upsert_habit_entries(user_id, list(rows.values()))
+        
+        changes = {}
+        for (habit_id, fecha), row in rows.items():
+            changes.setdefault(habit_id, []).append((fecha, row['estado'] == 'exito'))
+        for habit_id, habit_changes in changes.items():
+            rachas[habit_id] = apply_streak_changes(habit_id, user_id, sorted(habit_changes), commit=False)
+        
+        for row_key, row_indexes in indexes.items():
+            entry = entries[row_key]
+            for index in row_indexes:
+                results[index] = {
+                    'idempotency_key': items[index].get('idempotency_key'),
+                    'ok': True,
+                    'id': entry.id,
+                    'id_habito': entry.id_habito,
+                    'fecha': entry.fecha.isoformat(),
+                    'estado': entry.estado
+                }
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error al guardar lote de registros: {str(e)}")
+        return jsonify({'error': {'code': 'database_error', 'message': 'Error al guardar los registros'}}), 500
+    
+    return jsonify({
+        'resultados': results,
+        'rachas': rachas
+    })
+
 @auth_required
 def delete_habit_entry(habit_id, entry_id):
     """Eliminar un registro de hábito"""
@@ -589,10 +661,10 @@ def delete_habit_entry(habit_id, entry_id):
         id_clerk=g.current_user.id_clerk
     ).first_or_404()
     
-    db.session.delete(entry)
-    db.session.commit()
+    fecha = entry.fecha
+    remove_habit_entry(entry)
     
-    rachas = calculate_streak(habit_id, g.current_user.id_clerk)
+    rachas = update_streak_on_removal(habit_id, g.current_user.id_clerk, fecha)
     
     return jsonify({
         'ok': True,
@@ -626,58 +698,47 @@ def get_habit_streak(habit_id):
 
 @auth_required
 def get_habits_dashboard():
-    """Obtener resumen completo de hábitos con último registro, rachas y estadísticas"""
-    habits = db.session.query(Habit).filter(
+    """
+    Obtener resumen completo de hábitos con último registro, rachas y estadísticas.
+    
+    Presupuesto de consultas constante, sin importar el número de hábitos:
+    IDs de hábitos, rachas (más la verificación de ayer y sus escrituras solo en la
+    primera lectura del día), hábitos con su grupo, los totales de habito_contadores
+    (más un agregado de registros solo para los hábitos sin contador) y una búsqueda
+    puntual por (hábito, fecha) del último registro y el de hoy.
+    """
+    habits_query = db.session.query(Habit).filter(
         or_(
             Habit.id_propietario == g.current_user.id_clerk,
             Habit.id_grupo.in_(
                 db.session.query(GroupMember.id_grupo).filter_by(id_clerk=g.current_user.id_clerk)
             )
         )
-    ).filter(Habit.archivado == False).all()
+    ).filter(Habit.archivado == False)
     
     hoy_local = get_user_local_date(g.current_user.id_clerk)
+    habits, rachas_por_habito = load_habits_with_streaks(habits_query, g.current_user.id_clerk)
+    resumen_registros = get_entry_summaries(g.current_user.id_clerk, [habit.id for habit in habits], hoy_local)
     
     result = []
     for habit in habits:
 
-        rachas = calculate_streak(habit.id, g.current_user.id_clerk)
-        ultimo_registro = HabitEntry.query.filter_by(
-            id_habito=habit.id,
-            id_clerk=g.current_user.id_clerk
-        ).order_by(HabitEntry.fecha.desc()).first()
-        
-        total_registros = HabitEntry.query.filter_by(
-            id_habito=habit.id,
-            id_clerk=g.current_user.id_clerk
-        ).count()
-        
-        total_exitos = HabitEntry.query.filter_by(
-            id_habito=habit.id,
-            id_clerk=g.current_user.id_clerk,
-            estado='exito'
-        ).count()
-        
-        total_fallos = HabitEntry.query.filter_by(
-            id_habito=habit.id,
-            id_clerk=g.current_user.id_clerk,
-            estado='fallo'
-        ).count()
-        
-        registro_hoy = HabitEntry.query.filter_by(
-            id_habito=habit.id,
-            id_clerk=g.current_user.id_clerk,
-            fecha=hoy_local
-        ).first()
+        rachas = rachas_por_habito[habit.id]
+        resumen = resumen_registros.get(habit.id)
+        total_registros = resumen.total if resumen else 0
+        total_exitos = int(resumen.exitos or 0) if resumen else 0
+        total_fallos = int(resumen.fallos or 0) if resumen else 0
+        ultima_fecha = resumen.ultima_fecha if resumen else None
+        estado_hoy = resumen.estado_hoy if resumen else None
         
         tasa_exito = (total_exitos / total_registros * 100) if total_registros > 0 else 0
         
         fecha_creacion_local = format_datetime(habit.fecha_creacion, g.current_user.id_clerk)
         ultimo_registro_fecha = None
         ultimo_registro_hora = None
-        if ultimo_registro and ultimo_registro.fecha_hora_local:
+        if resumen and resumen.ultimo_fecha_hora_local:
             ultimo_registro_fecha, ultimo_registro_hora = format_datetime(
-                ultimo_registro.fecha_hora_local, 
+                resumen.ultimo_fecha_hora_local, 
                 g.current_user.id_clerk
             )
         
@@ -693,9 +754,9 @@ def get_habits_dashboard():
             'ultimo_registro': {
                 'fecha': ultimo_registro_fecha,
                 'hora': ultimo_registro_hora,
-                'estado': ultimo_registro.estado if ultimo_registro else None,
-                'comentario': ultimo_registro.comentario if ultimo_registro else None,
-                'dias_desde_ultimo': (hoy_local - ultimo_registro.fecha).days if ultimo_registro else None,
+                'estado': resumen.ultimo_estado if resumen else None,
+                'comentario': resumen.ultimo_comentario if resumen else None,
+                'dias_desde_ultimo': (hoy_local - ultima_fecha).days if ultima_fecha else None,
                 'zona_horaria': g.current_user.zona_horaria
             },
             'estadisticas': {
@@ -705,10 +766,10 @@ def get_habits_dashboard():
                 'tasa_exito': round(tasa_exito, 1)
             },
             'registro_hoy': {
-                'completado': registro_hoy is not None,
-                'estado': registro_hoy.estado if registro_hoy else None,
-                'comentario': registro_hoy.comentario if registro_hoy else None,
-                'puede_registrar': registro_hoy is None,
+                'completado': estado_hoy is not None,
+                'estado': estado_hoy,
+                'comentario': resumen.comentario_hoy if estado_hoy else None,
+                'puede_registrar': estado_hoy is None,
                 'fecha_local_usuario': hoy_local.isoformat()
             },
             'fecha_creacion': {
@@ -748,10 +809,7 @@ def get_habit_stats(habit_id):
     
     rachas = calculate_streak(habit_id, g.current_user.id_clerk)
     
-    total_registros = HabitEntry.query.filter_by(
-        id_habito=habit_id,
-        id_clerk=g.current_user.id_clerk
-    ).count()
+    total_registros = get_entry_count(habit_id, g.current_user.id_clerk).total
     
     registros_recientes = get_habit_recent_entries(habit_id, g.current_user.id_clerk, limit=10)
     
@@ -791,6 +849,7 @@ def get_streaks_overview():
 @auth_required
 def get_weekly_progress():
     from services.timezone_service import get_user_local_date
+    from services.report_service import count_active_habits, get_period_rollup
     from datetime import datetime, timedelta
     
     hoy_local = get_user_local_date(g.current_user.id_clerk)
@@ -800,43 +859,18 @@ def get_weekly_progress():
     
     domingo = lunes + timedelta(days=6)
     
-    semana = []
+    total_habitos = count_active_habits(g.current_user.id_clerk)
     
-    for i in range(7):
-        fecha_actual = lunes + timedelta(days=i)
-        
-        exitos = HabitEntry.query.filter(
-            HabitEntry.id_clerk == g.current_user.id_clerk,
-            HabitEntry.fecha == fecha_actual,
-            HabitEntry.estado == 'exito'
-        ).count()
-        
-        fallos = HabitEntry.query.filter(
-            HabitEntry.id_clerk == g.current_user.id_clerk,
-            HabitEntry.fecha == fecha_actual,
-            HabitEntry.estado == 'fallo'
-        ).count()
-        
-        total_habitos = Habit.query.filter(
-            or_(
-                Habit.id_propietario == g.current_user.id_clerk,
-                Habit.id_grupo.in_(
-                    db.session.query(GroupMember.id_grupo).filter_by(id_clerk=g.current_user.id_clerk)
-                )
-            ),
-            Habit.archivado == False
-        ).count()
-        
-        pendientes = total_habitos - (exitos + fallos)
-        
+    semana = []
+    for i, dia in enumerate(get_period_rollup(g.current_user.id_clerk, lunes, domingo)):
         semana.append({
-            'fecha': fecha_actual.isoformat(),
+            'fecha': dia.fecha.isoformat(),
             'dia_semana': ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo'][i],
-            'exitos': exitos,
-            'fallos': fallos,
-            'pendientes': pendientes,
+            'exitos': dia.exitos,
+            'fallos': dia.fallos,
+            'pendientes': total_habitos - (dia.exitos + dia.fallos),
             'total': total_habitos,
-            'es_hoy': fecha_actual == hoy_local
+            'es_hoy': dia.fecha == hoy_local
         })
     
     return jsonify({
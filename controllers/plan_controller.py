@@ -5,6 +5,7 @@ from services.timezone_service import TimezoneService
 from sqlalchemy import text
 import uuid
 import pytz
+from core.datetime_util import DateTimeUtil
 
 @auth_required
 def get_plans():
@@ -43,7 +44,7 @@ def get_my_subscription():
         }
     
     # Convertir fechas a zona horaria del usuario
-    user_timezone = pytz.timezone(g.current_user.zona_horaria)
+    user_timezone = DateTimeUtil.get_timezone(g.current_user.zona_horaria) or pytz.UTC
     
     periodo_inicio = None
     if subscription.periodo_inicio:
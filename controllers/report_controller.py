@@ -4,6 +4,7 @@ from services.auth_service import auth_required
 from sqlalchemy import or_
 from datetime import datetime, timedelta, date
 from services.date_service import parse_date
+from services.report_service import get_daily_totals, get_period_rollup
 
 @auth_required
 def get_reports_overview():
@@ -23,9 +24,11 @@ def get_reports_overview():
     rachas_activas = 0
     top_mejores = []
     
-    from services.habit_service import calculate_streak
-    for habit in habits_query.all():
-        rachas = calculate_streak(habit.id, g.current_user.id_clerk)
+    from services.habit_service import calculate_streaks
+    habits = habits_query.all()
+    rachas_por_habito = calculate_streaks(g.current_user.id_clerk, [habit.id for habit in habits])
+    for habit in habits:
+        rachas = rachas_por_habito[habit.id]
         if rachas['actual'] > 0:
             rachas_activas += 1
         
@@ -53,39 +56,21 @@ def get_reports_weekly():
     if not from_date or not to_date:
         return jsonify({'error': {'code': 'validation_error', 'message': 'from y to requeridos'}}), 422
     
-    parsed_from = parse_date(from_date)
-    parsed_to = parse_date(to_date)
-    
-    if not parsed_from or not parsed_to:
+    try:
+        parsed_from = parse_date(from_date).date()
+        parsed_to = parse_date(to_date).date()
+    except ValueError:
         return jsonify({'error': {'code': 'validation_error', 'message': 'Formato de fecha inválido'}}), 422
     
-    entries = db.session.query(HabitEntry, Habit).join(Habit).filter(
-        HabitEntry.id_clerk == g.current_user.id_clerk,
-        HabitEntry.fecha >= parsed_from,
-        HabitEntry.fecha <= parsed_to,
-        HabitEntry.estado == 'exito'
-    ).all()
-    
-    dias_detalle = {}
-    current_date = parsed_from
-    while current_date <= parsed_to:
-        dias_detalle[current_date.isoformat()] = {
-            'fecha': current_date.isoformat(),
-            'exitos': 0
-        }
-        current_date += timedelta(days=1)
-    
-    for entry, _ in entries:
-        fecha = entry.fecha.isoformat()
-        dias_detalle[fecha]['exitos'] += 1
+    dias = get_period_rollup(g.current_user.id_clerk, parsed_from, parsed_to)
     
     return jsonify({
         'periodo': {
             'desde': parsed_from.isoformat(),
             'hasta': parsed_to.isoformat()
         },
-        'total_exitos': len(entries),
-        'dias': list(dias_detalle.values())
+        'total_exitos': sum(dia.exitos for dia in dias),
+        'dias': [{'fecha': dia.fecha.isoformat(), 'exitos': dia.exitos} for dia in dias]
     })
 
 @auth_required
@@ -108,28 +93,27 @@ def get_reports_heatmap():
     else:
         last_day = date(year, month_num + 1, 1) - timedelta(days=1)
     
-    query = HabitEntry.query.filter(
-        HabitEntry.id_clerk == g.current_user.id_clerk,
-        HabitEntry.fecha >= first_day,
-        HabitEntry.fecha <= last_day
-    )
-    
     if habit_id and habit_id != 'all':
-        query = query.filter(HabitEntry.id_habito == habit_id)
-    
-    entries = query.all()
-    
-    date_map = {}
-    for entry in entries:
-        date_key = entry.fecha.isoformat()
-        date_map[date_key] = entry.estado
+        # Un hábito tiene a lo sumo un registro por día (uniq_registro): basta leer sus estados del mes
+        date_map = dict(db.session.query(HabitEntry.fecha, HabitEntry.estado).filter(
+            HabitEntry.id_habito == habit_id,
+            HabitEntry.id_clerk == g.current_user.id_clerk,
+            HabitEntry.fecha >= first_day,
+            HabitEntry.fecha <= last_day
+        ).all())
+    else:
+        # Todos los hábitos: un día cuenta como éxito si tuvo al menos un éxito
+        date_map = {
+            fecha: 'exito' if exitos else 'fallo'
+            for fecha, (exitos, fallos) in get_daily_totals(g.current_user.id_clerk, first_day, last_day).items()
+        }
     
     days = []
     current_date = first_day
     while current_date <= last_day:
         days.append({
             'date': current_date.isoformat(),
-            'estado': date_map.get(current_date.isoformat(), 'ninguno')
+            'estado': date_map.get(current_date, 'ninguno')
         })
         current_date += timedelta(days=1)
     
@@ -151,9 +135,10 @@ def get_streaks_overview():
     ).filter(Habit.archivado == False).all()
     
     result = []
-    from services.habit_service import calculate_streak
+    from services.habit_service import calculate_streaks
+    rachas_por_habito = calculate_streaks(g.current_user.id_clerk, [habit.id for habit in habits])
     for habit in habits:
-        rachas = calculate_streak(habit.id, g.current_user.id_clerk)
+        rachas = rachas_por_habito[habit.id]
         result.append({
             'habit_id': habit.id,
             'titulo': habit.titulo,
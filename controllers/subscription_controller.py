@@ -5,6 +5,7 @@ from services.timezone_service import TimezoneService
 from sqlalchemy.orm import joinedload
 from sqlalchemy import text
 import pytz
+from core.datetime_util import DateTimeUtil
 
 @auth_required
 def get_current_subscription():
@@ -44,7 +45,7 @@ def get_current_subscription():
         pagos = db.session.execute(sql_query, {"id_clerk": g.current_user.id_clerk}).fetchall()
         
         # Convertir fechas a zona horaria del usuario
-        user_timezone = pytz.timezone(g.current_user.zona_horaria)
+        user_timezone = DateTimeUtil.get_timezone(g.current_user.zona_horaria) or pytz.UTC
         
         def convert_to_user_timezone(dt):
             if dt:
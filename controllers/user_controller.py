@@ -1,10 +1,11 @@
 from flask import request, jsonify, g
 from models import db, User
-from services.auth_service import auth_required
-from services.timezone_service import get_user_local_date
+from services.auth_service import auth_required, invalidate_cached_user
+from services.timezone_service import get_user_local_date, reset_user_time_context
+from services.heatmap_service import HEATMAP_DEFAULT_WEEKS, HEATMAP_MAX_WEEKS, load_activity_heatmap
 from sqlalchemy import text
 from datetime import datetime, timedelta
-import pytz
+from core.datetime_util import DateTimeUtil
 
 @auth_required
 def me():
@@ -37,12 +38,10 @@ def update_me():
     if 'zona_horaria' in data:
         timezone = data['zona_horaria']
         if timezone in valid_timezones:
-            try:
-                # Verificar que la zona horaria sea válida
-                pytz.timezone(timezone)
-                user.zona_horaria = timezone
-            except pytz.exceptions.UnknownTimeZoneError:
+            # Verificar que la zona horaria sea válida
+            if DateTimeUtil.get_timezone(timezone) is None:
                 return jsonify({'error': {'code': 'invalid_timezone', 'message': 'Zona horaria inválida'}}), 422
+            user.zona_horaria = timezone
         else:
             return jsonify({'error': {'code': 'invalid_timezone', 'message': 'Zona horaria no soportada'}}), 422
     
@@ -68,6 +67,8 @@ def update_me():
         user.url_imagen = data['url_imagen']
     
     db.session.commit()
+    invalidate_cached_user(user.id_clerk)
+    reset_user_time_context(user.id_clerk)
     
     return jsonify({
         'id_clerk': user.id_clerk,
@@ -89,19 +90,18 @@ def get_local_time():
     timezone_name = getattr(user, 'zona_horaria', 'America/Lima')
     closure_hour = getattr(user, 'cierre_dia_hora', 0)
     
-    try:
-        tz = pytz.timezone(timezone_name)
-        now_local = datetime.now(tz)
-        
-        return jsonify({
-            'fecha_local': hoy_local.isoformat(),
-            'hora_local': now_local.strftime('%H:%M:%S'),
-            'zona_horaria': timezone_name,
-            'cierre_dia_hora': closure_hour,
-            'timestamp': now_local.isoformat()
-        })
-    except pytz.exceptions.UnknownTimeZoneError:
+    tz = DateTimeUtil.get_timezone(timezone_name)
+    if tz is None:
         return jsonify({'error': {'code': 'invalid_timezone', 'message': 'Zona horaria configurada inválida'}}), 500
+    now_local = datetime.now(tz)
+    
+    return jsonify({
+        'fecha_local': hoy_local.isoformat(),
+        'hora_local': now_local.strftime('%H:%M:%S'),
+        'zona_horaria': timezone_name,
+        'cierre_dia_hora': closure_hour,
+        'timestamp': now_local.isoformat()
+    })
 
 @auth_required
 def get_recent_activity():
@@ -123,13 +123,15 @@ def get_recent_activity():
         JOIN habitos h ON h.id = r.id_habito
         JOIN usuarios u ON u.id_clerk = r.id_clerk
         WHERE u.id_clerk = :user_id
-          AND r.fecha >= CURDATE() - INTERVAL :dias DAY
+          AND r.fecha >= :desde
         ORDER BY r.fecha DESC, r.fecha_creacion DESC
     """)
     
+    # El periodo se cuenta desde el día local del usuario, no desde CURDATE() del servidor
+    desde = get_user_local_date(user.id_clerk) - timedelta(days=dias_recientes)
     result = db.session.execute(sql, {
         'user_id': user.id_clerk,
-        'dias': dias_recientes
+        'desde': desde
     })
     
     # Convertir los resultados a una lista de diccionarios
@@ -205,129 +207,23 @@ def detect_timezone():
 def get_activity_heatmap():
     """Obtener datos para el heatmap de actividad al estilo GitHub"""
     user = g.current_user
-    semanas = request.args.get('weeks', '53')  # Por defecto 53 semanas (1 año + 1 semana extra como GitHub)
+    semanas = request.args.get('weeks', str(HEATMAP_DEFAULT_WEEKS))  # Por defecto 53 semanas (1 año + 1 semana extra como GitHub)
     
     try:
         semanas = int(semanas)
-        if semanas < 1:
+        if semanas < 1 or semanas > HEATMAP_MAX_WEEKS:
             raise ValueError
     except ValueError:
-        return jsonify({'error': {'code': 'invalid_weeks', 'message': 'El número de semanas debe ser un entero positivo'}}), 422
+        return jsonify({'error': {'code': 'invalid_weeks', 'message': f'El número de semanas debe ser un entero entre 1 y {HEATMAP_MAX_WEEKS}'}}), 422
     
-    # Query SQL para generar el heatmap
-    sql = text("""
-        WITH RECURSIVE cal AS (
-            SELECT DATE_SUB(
-                -- Comenzar desde el domingo de la semana actual
-                DATE_SUB(CURDATE(), INTERVAL (DAYOFWEEK(CURDATE()) - 1) DAY),
-                -- Retroceder 53 semanas (1 año + 1 semana) para asegurar cobertura completa
-                INTERVAL 52 WEEK
-            ) AS d
-            UNION ALL
-            SELECT DATE_ADD(d, INTERVAL 1 DAY) 
-            FROM cal 
-            WHERE d < CURDATE()
-        ),
-        agg AS (
-            SELECT fecha, SUM(estado = 'exito') AS exitos
-            FROM habito_registros
-            WHERE id_clerk = :user_id
-                AND fecha BETWEEN (
-                    SELECT MIN(d) FROM cal
-                ) AND CURDATE()
-            GROUP BY fecha
-        )
-        SELECT
-            (DAYOFWEEK(c.d) + 6) % 7 AS day_of_week_0_sun,
-            TIMESTAMPDIFF(
-                WEEK,
-                (SELECT MIN(d) FROM cal),
-                c.d
-            ) AS week_index,
-            COALESCE(a.exitos, 0) AS valor,
-            c.d AS fecha
-        FROM cal c
-        LEFT JOIN agg a ON a.fecha = c.d
-        ORDER BY week_index, day_of_week_0_sun;
-    """)
+    formato = request.args.get('format', 'json')
+    if formato not in ('json', 'compact'):
+        return jsonify({'error': {'code': 'validation_error', 'message': 'format debe ser "json" o "compact"'}}), 422
     
-    result = db.session.execute(sql, {
-        'user_id': user.id_clerk,
-        'weeks': semanas
-    })
-    
-    # Convertir resultados a formato de heatmap
-    heatmap_data = []
-    current_week = None
-    week_data = None
+    # El rango termina en el día local del usuario (zona horaria y hora de cierre)
+    hoy_local = get_user_local_date(user.id_clerk)
     
-    for row in result:
-        week_index = row.week_index
-        
-        if current_week != week_index:
-            if week_data:
-                heatmap_data.append(week_data)
-            current_week = week_index
-            week_data = {
-                'week_index': week_index,
-                'days': []
-            }
-        
-        week_data['days'].append({
-            'day_of_week': row.day_of_week_0_sun,
-            'value': row.valor,
-            'date': row.fecha.isoformat()
-        })
-    
-    # Agregar la última semana
-    if week_data:
-        heatmap_data.append(week_data)
-    
-    # Calcular estadísticas
-    total_dias = sum(len(week['days']) for week in heatmap_data)
-    dias_con_actividad = sum(
-        1 for week in heatmap_data
-        for day in week['days']
-        if day['value'] > 0
-    )
-    total_exitos = sum(
-        day['value']
-        for week in heatmap_data
-        for day in week['days']
-    )
-    
-    # Calcular fechas de inicio y fin del periodo
-    fecha_inicio = min(
-        day['date']
-        for week in heatmap_data
-        for day in week['days']
-    ) if heatmap_data and heatmap_data[0]['days'] else None
-    
-    fecha_fin = max(
-        day['date']
-        for week in heatmap_data
-        for day in week['days']
-    ) if heatmap_data and heatmap_data[-1]['days'] else None
-    
-    return jsonify({
-        'periodo_semanas': 53,  # Siempre 53 semanas (1 año + 1 semana extra)
-        'rango_fechas': {
-            'inicio': fecha_inicio,
-            'fin': fecha_fin
-        },
-        'estadisticas': {
-            'total_dias': total_dias,
-            'dias_con_actividad': dias_con_actividad,
-            'total_exitos': total_exitos,
-            'porcentaje_actividad': round(dias_con_actividad * 100 / total_dias if total_dias > 0 else 0, 1),
-            'promedio_diario': round(total_exitos / total_dias if total_dias > 0 else 0, 2),
-            'mejor_dia': max(
-                (day['value'] for week in heatmap_data for day in week['days']),
-                default=0
-            )
-        },
-        'heatmap': heatmap_data
-    })
+    return jsonify(load_activity_heatmap(user.id_clerk, hoy_local, weeks=semanas, compact=formato == 'compact'))
 
 @auth_required
 def get_habit_summary():
@@ -357,15 +253,17 @@ def get_habit_summary():
         JOIN usuarios u ON u.id_clerk = r.id_clerk
         JOIN habitos h ON h.id = r.id_habito
         WHERE u.id_clerk = :user_id
-        AND r.fecha >= DATE_SUB(CURDATE(), INTERVAL :weeks WEEK)
+        AND r.fecha >= :desde
         """ + ('' if include_archived else 'AND h.archivado = 0') + """
         GROUP BY u.id_clerk, h.id, h.titulo
         ORDER BY h.titulo
     """)
     
+    # El periodo se cuenta desde el día local del usuario, no desde CURDATE() del servidor
+    desde = get_user_local_date(user.id_clerk) - timedelta(weeks=semanas_atras)
     result = db.session.execute(sql, {
         'user_id': user.id_clerk,
-        'weeks': semanas_atras
+        'desde': desde
     })
     
     # Convertir resultados a lista de diccionarios
@@ -417,15 +315,17 @@ def get_weekly_progress():
         JOIN usuarios u ON u.id_clerk = r.id_clerk
         JOIN habitos h ON h.id = r.id_habito
         WHERE u.id_clerk = :user_id
-        AND r.fecha >= DATE_SUB(CURDATE(), INTERVAL :weeks WEEK)
+        AND r.fecha >= :desde
         """ + ('' if include_archived else 'AND h.archivado = 0') + """
         GROUP BY u.id_clerk, h.id, h.titulo
         ORDER BY h.titulo
     """)
     
+    # El periodo se cuenta desde el día local del usuario, no desde CURDATE() del servidor
+    desde = get_user_local_date(user.id_clerk) - timedelta(weeks=semanas_atras)
     result = db.session.execute(sql, {
         'user_id': user.id_clerk,
-        'weeks': semanas_atras
+        'desde': desde
     })
     
     # Convertir resultados a lista de diccionarios
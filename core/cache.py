@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+class TTLCache:
+    """
+    Caché LRU acotada con expiración por entrada y contadores de aciertos/fallos.
+
+    Es segura entre hilos y vive en memoria del proceso, por lo que cada worker
+    mantiene su propia copia.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Obtener un valor si existe y no ha expirado.
+
+        Args:
+            key: Clave a buscar
+            default: Valor a retornar si no hay entrada válida
+
+        Returns:
+            El valor almacenado o `default`
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Guardar un valor.
+
+        Args:
+            key: Clave
+            value: Valor a guardar
+            ttl: Segundos de vida de la entrada (por defecto el TTL de la caché)
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Eliminar una entrada si existe"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        Eliminar todas las entradas que cumplan una condición.
+
+        Args:
+            predicate: Función (clave, valor) -> bool
+
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Vaciar la caché"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Obtener estadísticas de uso de la caché.
+
+        Returns:
+            dict: Tamaño, capacidad, aciertos, fallos, desalojos y tasa de aciertos
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0
+            }
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Deduplica llamadas concurrentes con la misma clave: el primer hilo ejecuta la
+    función y los demás esperan y reciben su mismo resultado (o excepción).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Ejecutar `fn` una sola vez por clave entre los hilos que la piden a la vez.
+
+        Args:
+            key: Clave de deduplicación
+            fn: Función sin argumentos a ejecutar
+
+        Returns:
+            El resultado de `fn`
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
@@ -1,10 +1,24 @@
 import logging
-from datetime import datetime
+from datetime import datetime, tzinfo
 import pytz
-from typing import Optional
+from typing import Dict, Optional
+from core.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Zonas horarias ya resueltas por nombre. Solo se guardan nombres canónicos de
+# pytz.all_timezones, así que su tamaño está acotado aunque los nombres lleguen
+# de cabeceras o datos de usuario.
+# Se llena al primer uso en lugar de precargarse: resolver las ~600 zonas abriría
+# sus ficheros de zoneinfo al importar en cada worker y comando, y en la práctica
+# solo se usan unas pocas.
+_TZ_REGISTRY: Dict[str, tzinfo] = {'UTC': pytz.UTC}
+
+# Nombres rechazados recientemente. Acotada y con expiración para que un nombre
+# inválido repetido (p. ej. desde una cabecera) no vuelva a pasar por pytz ni
+# llene el log de errores.
+_INVALID_TZ_NAMES = TTLCache(maxsize=1024, ttl=3600)
+
 class DateTimeUtil:
     @staticmethod
     def ensure_utc(dt: datetime) -> datetime:
@@ -29,6 +43,38 @@ class DateTimeUtil:
             
         return dt.astimezone(pytz.UTC)
 
+    @staticmethod
+    def get_timezone(timezone: str) -> Optional[tzinfo]:
+        """
+        Obtiene el objeto de zona horaria para un nombre, resolviéndolo una sola vez por proceso.
+        
+        Args:
+            timezone: Nombre de la zona horaria (p. ej. 'America/Lima')
+            
+        Returns:
+            tzinfo: Zona horaria de pytz o None si el nombre es inválido
+        """
+        try:
+            return _TZ_REGISTRY[timezone]
+        except KeyError:
+            pass
+        except TypeError:
+            return None
+        
+        if _INVALID_TZ_NAMES.get(timezone):
+            logger.debug(f"Zona horaria inválida (en caché): {timezone}")
+            return None
+        
+        try:
+            tz = pytz.timezone(timezone)
+        except (pytz.exceptions.UnknownTimeZoneError, AttributeError, ValueError):
+            logger.error(f"Zona horaria inválida: {timezone}")
+            _INVALID_TZ_NAMES.set(timezone, True)
+            return None
+        if timezone in pytz.all_timezones_set:
+            _TZ_REGISTRY[timezone] = tz
+        return tz
+
     @staticmethod
     def validate_timezone(timezone: str) -> Optional[str]:
         """
@@ -40,11 +86,8 @@ class DateTimeUtil:
         Returns:
             str: Nombre canónico de la zona horaria o None si es inválida
         """
-        try:
-            return pytz.timezone(timezone).zone
-        except pytz.exceptions.UnknownTimeZoneError:
-            logger.error(f"Zona horaria inválida: {timezone}")
-            return None
+        tz = DateTimeUtil.get_timezone(timezone)
+        return tz.zone if tz is not None else None
 
     @staticmethod
     def get_current_utc() -> datetime:
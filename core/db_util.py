@@ -0,0 +1,61 @@
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from sqlalchemy.dialects import mysql, sqlite, postgresql
+from models import db
+
+UpdateSpec = Union[None, Iterable[str], Dict[str, Optional[Callable]]]
+
+class DBUtil:
+    @staticmethod
+    def dialect_name() -> str:
+        """Nombre del dialecto de la conexión actual (mysql, sqlite, postgresql...)"""
+        return db.session.get_bind().dialect.name
+
+    @staticmethod
+    def build_upsert(model, rows: Union[dict, List[dict]], conflict_columns: List[str], update: UpdateSpec = None):
+        """
+        Construye un INSERT ... ON DUPLICATE KEY UPDATE (MySQL) o su equivalente
+        ON CONFLICT (SQLite/PostgreSQL) para una o varias filas.
+
+        Args:
+            model: Modelo o tabla destino
+            rows: Fila o lista de filas a insertar
+            conflict_columns: Columnas de la clave única que detecta el duplicado
+                (MySQL las deduce de los índices, pero SQLite/PostgreSQL las necesitan)
+            update: Qué hacer ante un duplicado:
+                - None: no modificar la fila existente
+                - lista de columnas: copiar los valores insertados
+                - dict columna -> None (copiar el valor insertado) o función
+                  (tabla, insertados) -> expresión SQL
+
+        Returns:
+            Sentencia lista para `db.session.execute`
+        """
+        table = getattr(model, '__table__', model)
+        if update is not None and not isinstance(update, dict):
+            update = {column: None for column in update}
+
+        dialect = DBUtil.dialect_name()
+        if dialect == 'mysql':
+            stmt = mysql.insert(table).values(rows)
+            inserted = stmt.inserted
+            if not update:
+                # Reasignar la clave a sí misma equivale a ignorar el duplicado
+                first = conflict_columns[0]
+                return stmt.on_duplicate_key_update({first: table.c[first]})
+            return stmt.on_duplicate_key_update({
+                column: (inserted[column] if expr is None else expr(table, inserted))
+                for column, expr in update.items()
+            })
+
+        insert_fn = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert_fn(table).values(rows)
+        if not update:
+            return stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+        excluded = stmt.excluded
+        return stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={
+                column: (excluded[column] if expr is None else expr(table, excluded))
+                for column, expr in update.items()
+            }
+        )
@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, or_
+
+class CursorError(ValueError):
+    """Cursor de paginación mal formado o que no corresponde al listado"""
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Codifica los valores de la última fila de una página como cursor opaco.
+
+    Args:
+        values: Valores de las columnas de orden de la última fila
+
+    Returns:
+        str: Cursor en base64 apto para URL
+    """
+    raw = json.dumps([_serialize(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: Optional[str], parsers: Sequence[Callable[[Any], Any]]) -> Optional[List[Any]]:
+    """
+    Decodifica un cursor generado por `encode_cursor`.
+
+    Args:
+        cursor: Cursor recibido (vacío o None significa primera página)
+        parsers: Función de conversión para cada columna (p. ej. date.fromisoformat)
+
+    Returns:
+        list: Valores de las columnas de orden o None para la primera página
+
+    Raises:
+        CursorError: Si el cursor no es válido
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise CursorError('Cursor inválido')
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except CursorError:
+        raise
+    except Exception as e:
+        raise CursorError('Cursor inválido') from e
+
+def keyset_filter(columns: Sequence[Any], values: Sequence[Any], descending: bool = False):
+    """
+    Condición para continuar después de una fila en orden (col1, col2, ...).
+
+    Se expande como `c1 > v1 OR (c1 = v1 AND c2 > v2) ...` (o `<` en orden
+    descendente) para que el motor pueda usar el índice de las columnas de orden.
+
+    Args:
+        columns: Columnas de orden, de la más a la menos significativa
+        values: Valores de la última fila de la página anterior
+        descending: Si el orden es descendente
+
+    Returns:
+        Expresión SQL para `filter`
+    """
+    conditions = []
+    for index, column in enumerate(columns):
+        after = column < values[index] if descending else column > values[index]
+        equal_prefix = [columns[i] == values[i] for i in range(index)]
+        conditions.append(and_(*equal_prefix, after) if equal_prefix else after)
+    return or_(*conditions)
+
+def split_page(rows: Sequence[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Separa una página consultada con `limit + 1` filas y calcula el siguiente cursor.
+
+    Args:
+        rows: Filas obtenidas (hasta limit + 1)
+        limit: Tamaño de página
+        key: Función que devuelve los valores de orden de una fila
+
+    Returns:
+        tuple: (filas de la página, siguiente cursor o None si no hay más)
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(key(page[-1]))
@@ -35,6 +35,7 @@ CREATE TABLE `usuarios` (
   `idioma` varchar(10) DEFAULT 'es',
   `zona_horaria` varchar(50) DEFAULT 'America/Lima',
   `cierre_dia_hora` tinyint(4) DEFAULT 0,
+  `perfil_hash` char(64) DEFAULT NULL,
   `fecha_creacion` timestamp NOT NULL DEFAULT current_timestamp(),
   `fecha_actualizacion` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
   PRIMARY KEY (`id_clerk`)
@@ -81,6 +82,31 @@ CREATE TABLE `pagos_inbox` (
 
 -- --------------------------------------------------------
 
+--
+-- Estructura de tabla para la tabla `correo_salida`
+-- (cola de correos salientes, ver services/mail_outbox_service.py)
+--
+
+CREATE TABLE `correo_salida` (
+  `id` char(36) NOT NULL,
+  `destinatario` varchar(191) NOT NULL,
+  `asunto` varchar(255) NOT NULL,
+  `html` mediumtext NOT NULL,
+  `tipo` varchar(50) NOT NULL,
+  `referencia` char(36) DEFAULT NULL,
+  `estado` enum('pendiente','enviado','fallido') NOT NULL DEFAULT 'pendiente',
+  `intentos` int(11) NOT NULL DEFAULT 0,
+  `siguiente_intento` datetime NOT NULL DEFAULT current_timestamp(),
+  `bloqueado_hasta` datetime DEFAULT NULL,
+  `ultimo_error` text DEFAULT NULL,
+  `enviado_en` datetime DEFAULT NULL,
+  `fecha_creacion` datetime DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  KEY `idx_correo_pendiente` (`estado`,`siguiente_intento`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Estructura de tabla para la tabla `cupones`
 --
@@ -135,6 +161,7 @@ CREATE TABLE `grupo_invitaciones` (
   PRIMARY KEY (`id`),
   KEY `fk_inv_invitador` (`id_invitador`),
   KEY `idx_inv_grupo_estado` (`id_grupo`,`estado`),
+  KEY `idx_inv_estado_expira` (`estado`,`expira_en`),
   CONSTRAINT `fk_inv_grupo` FOREIGN KEY (`id_grupo`) REFERENCES `grupos` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_inv_invitador` FOREIGN KEY (`id_invitador`) REFERENCES `usuarios` (`id_clerk`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -200,6 +227,66 @@ CREATE TABLE `habito_rachas` (
 
 -- --------------------------------------------------------
 
+--
+-- Estructura de tabla para la tabla `habito_rachas_tramos`
+-- (tramos de días consecutivos con éxito por hábito y usuario)
+--
+
+CREATE TABLE `habito_rachas_tramos` (
+  `id` char(36) NOT NULL,
+  `id_habito` char(36) NOT NULL,
+  `id_clerk` varchar(191) NOT NULL,
+  `inicio` date NOT NULL,
+  `fin` date NOT NULL,
+  `longitud` int(11) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uniq_tramo_inicio` (`id_habito`,`id_clerk`,`inicio`),
+  KEY `idx_tramo_fin` (`id_habito`,`id_clerk`,`fin`),
+  KEY `fk_tramo_usuario` (`id_clerk`),
+  CONSTRAINT `fk_tramo_habito` FOREIGN KEY (`id_habito`) REFERENCES `habitos` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_tramo_usuario` FOREIGN KEY (`id_clerk`) REFERENCES `usuarios` (`id_clerk`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Estructura de tabla para la tabla `habito_contadores`
+-- (totales de registros por hábito y usuario, mantenidos al escribir registros)
+--
+
+CREATE TABLE `habito_contadores` (
+  `id_habito` char(36) NOT NULL,
+  `id_clerk` varchar(191) NOT NULL,
+  `total` int(11) NOT NULL DEFAULT 0,
+  `exitos` int(11) NOT NULL DEFAULT 0,
+  `fallos` int(11) NOT NULL DEFAULT 0,
+  `primera_fecha` date DEFAULT NULL,
+  `ultima_fecha` date DEFAULT NULL,
+  `fecha_actualizacion` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`id_habito`,`id_clerk`),
+  KEY `fk_contador_usuario` (`id_clerk`),
+  CONSTRAINT `fk_contador_habito` FOREIGN KEY (`id_habito`) REFERENCES `habitos` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_contador_usuario` FOREIGN KEY (`id_clerk`) REFERENCES `usuarios` (`id_clerk`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Estructura de tabla para la tabla `registro_resumen_diario`
+-- (éxitos y fallos por usuario y día, mantenidos al escribir registros)
+--
+
+CREATE TABLE `registro_resumen_diario` (
+  `id_clerk` varchar(191) NOT NULL,
+  `fecha` date NOT NULL,
+  `exitos` int(11) NOT NULL DEFAULT 0,
+  `fallos` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`id_clerk`,`fecha`),
+  CONSTRAINT `fk_resumen_usuario` FOREIGN KEY (`id_clerk`) REFERENCES `usuarios` (`id_clerk`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Estructura de tabla para la tabla `habito_registros`
 --
@@ -218,7 +305,7 @@ CREATE TABLE `habito_registros` (
   UNIQUE KEY `uniq_registro` (`id_habito`,`id_clerk`,`fecha`),
   KEY `idx_reg_fecha` (`fecha`),
   KEY `idx_reg_fecha_hora_local` (`fecha_hora_local`),
-  KEY `idx_reg_usuario` (`id_clerk`),
+  KEY `idx_reg_clerk_fecha` (`id_clerk`,`fecha`),
   KEY `idx_reg_habito_fecha` (`id_habito`,`fecha`),
   CONSTRAINT `fk_reg_habito` FOREIGN KEY (`id_habito`) REFERENCES `habitos` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_reg_usuario` FOREIGN KEY (`id_clerk`) REFERENCES `usuarios` (`id_clerk`) ON DELETE CASCADE
@@ -0,0 +1,3 @@
+-- Huella de los claims de perfil del token de Clerk (ver services/auth_service.get_or_create_user)
+ALTER TABLE `usuarios`
+  ADD COLUMN `perfil_hash` char(64) DEFAULT NULL AFTER `cierre_dia_hora`;
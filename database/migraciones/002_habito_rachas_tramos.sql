@@ -0,0 +1,18 @@
+-- Tramos de días consecutivos con éxito (ver services/streak_runs_service.py)
+CREATE TABLE `habito_rachas_tramos` (
+  `id` char(36) NOT NULL,
+  `id_habito` char(36) NOT NULL,
+  `id_clerk` varchar(191) NOT NULL,
+  `inicio` date NOT NULL,
+  `fin` date NOT NULL,
+  `longitud` int(11) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uniq_tramo_inicio` (`id_habito`,`id_clerk`,`inicio`),
+  KEY `idx_tramo_fin` (`id_habito`,`id_clerk`,`fin`),
+  KEY `fk_tramo_usuario` (`id_clerk`),
+  CONSTRAINT `fk_tramo_habito` FOREIGN KEY (`id_habito`) REFERENCES `habitos` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_tramo_usuario` FOREIGN KEY (`id_clerk`) REFERENCES `usuarios` (`id_clerk`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Después de crear la tabla, poblarla desde el historial:
+--   flask --app app streaks rebuild-runs
@@ -0,0 +1,18 @@
+-- Contadores de registros por hábito y usuario (ver services/entry_stats_service.py)
+CREATE TABLE `habito_contadores` (
+  `id_habito` char(36) NOT NULL,
+  `id_clerk` varchar(191) NOT NULL,
+  `total` int(11) NOT NULL DEFAULT 0,
+  `exitos` int(11) NOT NULL DEFAULT 0,
+  `fallos` int(11) NOT NULL DEFAULT 0,
+  `primera_fecha` date DEFAULT NULL,
+  `ultima_fecha` date DEFAULT NULL,
+  `fecha_actualizacion` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`id_habito`,`id_clerk`),
+  KEY `fk_contador_usuario` (`id_clerk`),
+  CONSTRAINT `fk_contador_habito` FOREIGN KEY (`id_habito`) REFERENCES `habitos` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_contador_usuario` FOREIGN KEY (`id_clerk`) REFERENCES `usuarios` (`id_clerk`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Después de crear la tabla, poblarla desde el historial:
+--   flask --app app counters rebuild
@@ -0,0 +1,21 @@
+-- Cola de correos salientes (ver services/mail_outbox_service.py)
+CREATE TABLE `correo_salida` (
+  `id` char(36) NOT NULL,
+  `destinatario` varchar(191) NOT NULL,
+  `asunto` varchar(255) NOT NULL,
+  `html` mediumtext NOT NULL,
+  `tipo` varchar(50) NOT NULL,
+  `referencia` char(36) DEFAULT NULL,
+  `estado` enum('pendiente','enviado','fallido') NOT NULL DEFAULT 'pendiente',
+  `intentos` int(11) NOT NULL DEFAULT 0,
+  `siguiente_intento` datetime NOT NULL DEFAULT current_timestamp(),
+  `bloqueado_hasta` datetime DEFAULT NULL,
+  `ultimo_error` text DEFAULT NULL,
+  `enviado_en` datetime DEFAULT NULL,
+  `fecha_creacion` datetime DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  KEY `idx_correo_pendiente` (`estado`,`siguiente_intento`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Los correos se envían con:
+--   flask --app app mail send-outbox
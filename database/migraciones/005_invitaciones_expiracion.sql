@@ -0,0 +1,3 @@
+-- Índice para el barrido de invitaciones vencidas (`flask invites expire`, ver services/invite_service.py)
+ALTER TABLE `grupo_invitaciones`
+  ADD KEY `idx_inv_estado_expira` (`estado`,`expira_en`);
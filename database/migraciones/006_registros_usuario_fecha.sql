@@ -0,0 +1,6 @@
+-- Rango por usuario y fecha para heatmap y reportes (ver services/heatmap_service.py).
+-- El nuevo índice empieza por id_clerk, así que también sirve a fk_reg_usuario y
+-- reemplaza a idx_reg_usuario.
+ALTER TABLE `habito_registros`
+  ADD KEY `idx_reg_clerk_fecha` (`id_clerk`,`fecha`),
+  DROP KEY `idx_reg_usuario`;
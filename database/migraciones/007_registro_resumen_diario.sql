@@ -0,0 +1,14 @@
+-- Resumen diario de registros por usuario para reportes (ver services/daily_rollup_service.py)
+CREATE TABLE `registro_resumen_diario` (
+  `id_clerk` varchar(191) NOT NULL,
+  `fecha` date NOT NULL,
+  `exitos` int(11) NOT NULL DEFAULT 0,
+  `fallos` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`id_clerk`,`fecha`),
+  CONSTRAINT `fk_resumen_usuario` FOREIGN KEY (`id_clerk`) REFERENCES `usuarios` (`id_clerk`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Después de crear la tabla (y con el código que la mantiene ya desplegado), poblarla
+-- desde el historial y activar REPORTS_USE_DAILY_ROLLUP:
+--   flask --app app reports backfill
+--   flask --app app reports check
@@ -6,8 +6,8 @@ db = SQLAlchemy()
 # Importar todos los modelos para hacerlos disponibles desde el paquete models
 from models.user import User
 from models.plan import Plan, Subscription
-from models.habit import Habit, HabitEntry, HabitStreak
+from models.habit import Habit, HabitEntry, HabitStreak, HabitStreakRun, HabitEntryCounter, DailyEntrySummary
 from models.group import Group, GroupMember, GroupInvite
-from models.notification import Notification
+from models.notification import Notification, EmailOutbox
 from models.coupon import Coupon  # Importar Coupon antes de payment
 from models.payment import PaymentInbox, PaymentHistory
\ No newline at end of file
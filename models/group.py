@@ -35,6 +35,7 @@ class GroupInvite(db.Model):
     expira_en = db.Column(db.DateTime, nullable=False)
     rol = db.Column(db.Enum('administrador', 'miembro'), default='miembro')
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('idx_inv_estado_expira', 'estado', 'expira_en'),)
     
     group = db.relationship('Group', passive_deletes=True)
     invitador = db.relationship('User', backref='invites_sent')
@@ -33,7 +33,10 @@ class HabitEntry(db.Model):
     habit = db.relationship('Habit', backref='entries')
     user = db.relationship('User', backref='habit_entries')
     
-    __table_args__ = (db.UniqueConstraint('id_habito', 'id_clerk', 'fecha', name='uniq_registro'),)
+    __table_args__ = (
+        db.UniqueConstraint('id_habito', 'id_clerk', 'fecha', name='uniq_registro'),
+        db.Index('idx_reg_clerk_fecha', 'id_clerk', 'fecha'),
+    )
 
 class HabitStreak(db.Model):
     __tablename__ = 'habito_rachas'
@@ -46,4 +49,39 @@ class HabitStreak(db.Model):
     fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     habit = db.relationship('Habit', backref='streaks')
-    user = db.relationship('User', backref='habit_streaks')
\ No newline at end of file
+    user = db.relationship('User', backref='habit_streaks')
+
+class HabitStreakRun(db.Model):
+    """Tramo de días consecutivos con éxito de un hábito para un usuario"""
+    __tablename__ = 'habito_rachas_tramos'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id_habito = db.Column(db.String(36), db.ForeignKey('habitos.id'), nullable=False)
+    id_clerk = db.Column(db.String(191), db.ForeignKey('usuarios.id_clerk'), nullable=False)
+    inicio = db.Column(db.Date, nullable=False)
+    fin = db.Column(db.Date, nullable=False)
+    longitud = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('id_habito', 'id_clerk', 'inicio', name='uniq_tramo_inicio'),
+        db.Index('idx_tramo_fin', 'id_habito', 'id_clerk', 'fin'),
+    )
+
+class HabitEntryCounter(db.Model):
+    """Totales de registros de un hábito para un usuario"""
+    __tablename__ = 'habito_contadores'
+    id_habito = db.Column(db.String(36), db.ForeignKey('habitos.id'), primary_key=True)
+    id_clerk = db.Column(db.String(191), db.ForeignKey('usuarios.id_clerk'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    exitos = db.Column(db.Integer, nullable=False, default=0)
+    fallos = db.Column(db.Integer, nullable=False, default=0)
+    primera_fecha = db.Column(db.Date)
+    ultima_fecha = db.Column(db.Date)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DailyEntrySummary(db.Model):
+    """Éxitos y fallos de un usuario en un día, sumando todos sus hábitos"""
+    __tablename__ = 'registro_resumen_diario'
+    id_clerk = db.Column(db.String(191), db.ForeignKey('usuarios.id_clerk'), primary_key=True)
+    fecha = db.Column(db.Date, primary_key=True)
+    exitos = db.Column(db.Integer, nullable=False, default=0)
+    fallos = db.Column(db.Integer, nullable=False, default=0)
@@ -13,3 +13,22 @@ class Notification(db.Model):
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', backref='notifications')
+
+class EmailOutbox(db.Model):
+    """Correo pendiente de envío (lo despacha `flask mail send-outbox`)"""
+    __tablename__ = 'correo_salida'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    destinatario = db.Column(db.String(191), nullable=False)
+    asunto = db.Column(db.String(255), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    tipo = db.Column(db.String(50), nullable=False)
+    referencia = db.Column(db.String(36))
+    estado = db.Column(db.Enum('pendiente', 'enviado', 'fallido'), nullable=False, default='pendiente')
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    siguiente_intento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    bloqueado_hasta = db.Column(db.DateTime)
+    ultimo_error = db.Column(db.Text)
+    enviado_en = db.Column(db.DateTime)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.Index('idx_correo_pendiente', 'estado', 'siguiente_intento'),)
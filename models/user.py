@@ -12,6 +12,7 @@ class User(db.Model):
     idioma = db.Column(db.String(10), default='es')
     zona_horaria = db.Column(db.String(50), default='America/Lima')
     cierre_dia_hora = db.Column(db.Integer, default=0)
+    perfil_hash = db.Column(db.String(64))
     fecha_creacion = db.Column(db.DateTime, default=lambda: DateTimeUtil.get_current_utc())
     fecha_actualizacion = db.Column(db.DateTime, default=lambda: DateTimeUtil.get_current_utc(), 
                                   onupdate=lambda: DateTimeUtil.get_current_utc())
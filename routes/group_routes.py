@@ -1,6 +1,6 @@
 from flask import Blueprint
 from controllers.group_controller import (
-    get_groups, create_group, get_group, update_group, delete_group,
+    get_groups, create_group, get_group, get_group_leaderboard, update_group, delete_group,
     add_member, remove_member, update_member_role, create_invite, accept_invite, 
     get_invites, get_group_invites, verify_invitation, create_batch_invites,
     leave_group
@@ -11,6 +11,7 @@ group_bp = Blueprint('groups', __name__, url_prefix='/api/v1/groups')
 group_bp.add_url_rule('', view_func=get_groups, methods=['GET'])
 group_bp.add_url_rule('', view_func=create_group, methods=['POST'])
 group_bp.add_url_rule('/<string:group_id>', view_func=get_group, methods=['GET'])
+group_bp.add_url_rule('/<string:group_id>/leaderboard', view_func=get_group_leaderboard, methods=['GET'])
 group_bp.add_url_rule('/<string:group_id>', view_func=update_group, methods=['PATCH'])
 group_bp.add_url_rule('/<string:group_id>', view_func=delete_group, methods=['DELETE'])
 group_bp.add_url_rule('/<string:group_id>/members', view_func=add_member, methods=['POST'])
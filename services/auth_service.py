@@ -1,52 +1,71 @@
 import jwt
-import requests
+import hashlib
+import json
+import logging
+import time
 from flask import current_app, g
 from models import db, User
 from functools import wraps
 from flask import request, jsonify
+from sqlalchemy.orm import make_transient_to_detached
 import traceback
+from core.cache import TTLCache
+from core.db_util import DBUtil
 from services.clerk_service import get_clerk_user_data
+from services.jwks_service import get_jwks_cache
 
 def verify_clerk_token(token):
     """Verificar token JWT de Clerk"""
     try:
-        jwks_url = current_app.config['CLERK_JWKS_URL']
-        response = requests.get(jwks_url)
-        jwks = response.json()
-        
-        decoded = jwt.decode(token, options={"verify_signature": False})
-        
-        # Verificar si el token es de nuestro template personalizado
-        template_id = current_app.config.get('CLERK_JWT_TEMPLATE_ID')
-        using_custom_template = decoded.get('jwt_template_id') == template_id if template_id else False
+        jwks_cache = get_jwks_cache(
+            current_app.config['CLERK_JWKS_URL'],
+            ttl=current_app.config['CLERK_JWKS_CACHE_TTL'],
+            min_refresh_interval=current_app.config['CLERK_JWKS_MIN_REFRESH'],
+            timeout=current_app.config['CLERK_HTTP_TIMEOUT']
+        )
         
-        # Mostrar todo el contenido del token para depuración (excepto información sensible)
-        token_content = {k: v for k, v in decoded.items() if k not in ['aud', 'azp', 'jti']}
-        current_app.logger.info(f"CONTENIDO COMPLETO DEL TOKEN: {token_content}")
+        # La firma se valida localmente con las claves en caché
+        header = jwt.get_unverified_header(token)
+        signing_key = jwks_cache.get_signing_key(header.get('kid'))
         
-        # Registrar datos específicos importantes
-        current_app.logger.info(
-            f"DATOS DE USUARIO EN TOKEN: "
-            f"sub={decoded.get('sub')}, "
-            f"email={decoded.get('email')}, "
-            f"email_address={decoded.get('email_address')}, "
-            f"nombre_completo={decoded.get('nombre_completo')}, "
-            f"name={decoded.get('name')}, "
-            f"first_name={decoded.get('first_name')}, "
-            f"last_name={decoded.get('last_name')}, "
-            f"jwt_template_id={decoded.get('jwt_template_id')}"
+        decoded = jwt.decode(
+            token,
+            signing_key.key,
+            algorithms=['RS256'],
+            leeway=current_app.config['CLERK_JWT_LEEWAY'],
+            options={"verify_aud": False, "require": ["exp", "sub"]}
         )
         
+        # Mostrar el contenido del token para depuración (excepto información sensible)
+        if current_app.logger.isEnabledFor(logging.DEBUG):
+            token_content = {k: v for k, v in decoded.items() if k not in ['aud', 'azp', 'jti']}
+            current_app.logger.debug(f"CONTENIDO COMPLETO DEL TOKEN: {token_content}")
+        
         return decoded
     except Exception as e:
         current_app.logger.error(f"Error verificando token: {str(e)}")
         return None
 
+# Claims del token que alimentan el perfil del usuario
+PROFILE_CLAIMS = ('email', 'email_address', 'email_addresses', 'nombre_completo',
+                  'name', 'first_name', 'last_name', 'picture')
+
+def profile_fingerprint(payload):
+    """Huella SHA-256 de los claims de perfil del token"""
+    claims = {claim: payload.get(claim) for claim in PROFILE_CLAIMS}
+    raw = json.dumps(claims, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
 def get_or_create_user(payload):
     """Obtener o crear usuario a partir de payload JWT"""
     user_id = payload.get('sub')
     user = User.query.filter_by(id_clerk=user_id).first()
     
+    # Si los claims de perfil no cambiaron desde la última sincronización, solo lectura
+    perfil_hash = profile_fingerprint(payload)
+    if user and user.perfil_hash == perfil_hash:
+        return user
+    
     # Verificar si el token es de nuestro template personalizado
     template_id = current_app.config.get('CLERK_JWT_TEMPLATE_ID')
     using_custom_template = payload.get('jwt_template_id') == template_id if template_id else False
@@ -114,53 +133,110 @@ def get_or_create_user(payload):
         current_app.logger.info(f"Usando token personalizado para usuario {payload.get('sub')}")
     
     if not user:
-        # Crear nuevo usuario
-        user = User(
-            id_clerk=payload.get('sub'),
-            correo=email,
-            nombre_completo=nombre_completo,
-            url_imagen=url_imagen
-        )
-        db.session.add(user)
-        try:
-            current_app.logger.info(f"CREANDO NUEVO USUARIO: id_clerk={payload.get('sub')}, "
-                                   f"correo={email}, nombre_completo={nombre_completo}")
-            db.session.commit()
-            current_app.logger.info(f"USUARIO CREADO EXITOSAMENTE: {user.id_clerk}")
-        except Exception as e:
-            db.session.rollback()
-            current_app.logger.error(f"ERROR AL CREAR USUARIO: {str(e)}")
-            user = User.query.filter_by(id_clerk=payload.get('sub')).first()
-            if not user:
-                raise e
+        # Crear nuevo usuario; si otra petición lo creó en paralelo se conserva esa fila
+        current_app.logger.info(f"CREANDO NUEVO USUARIO: id_clerk={user_id}, "
+                               f"correo={email}, nombre_completo={nombre_completo}")
+        db.session.execute(DBUtil.build_upsert(
+            User,
+            {
+                'id_clerk': user_id,
+                'correo': email,
+                'nombre_completo': nombre_completo,
+                'url_imagen': url_imagen,
+                'perfil_hash': perfil_hash
+            },
+            conflict_columns=['id_clerk']
+        ))
+        db.session.commit()
+        user = User.query.filter_by(id_clerk=user_id).first()
+        current_app.logger.info(f"USUARIO CREADO EXITOSAMENTE: {user.id_clerk}")
     else:
         # Actualizar información si es necesario
         current_app.logger.info(f"USUARIO EXISTENTE: id_clerk={user.id_clerk}, "
                                f"correo_actual={user.correo}, nombre_actual={user.nombre_completo}")
         
-        actualizado = False
-        
         if email and (not user.correo or user.correo != email):
             current_app.logger.info(f"ACTUALIZANDO CORREO: {user.correo} -> {email}")
             user.correo = email
-            actualizado = True
             
         if nombre_completo and (not user.nombre_completo or user.nombre_completo != nombre_completo):
             current_app.logger.info(f"ACTUALIZANDO NOMBRE: {user.nombre_completo} -> {nombre_completo}")
             user.nombre_completo = nombre_completo
-            actualizado = True
             
         if url_imagen and not user.url_imagen:
             user.url_imagen = url_imagen
-            actualizado = True
-            
-        if actualizado:
-            try:
-                db.session.commit()
-                current_app.logger.info(f"Usuario actualizado: {user.id_clerk}")
-            except Exception as e:
-                db.session.rollback()
-                current_app.logger.error(f"Error al actualizar usuario: {str(e)}")
+        
+        # Guardar la huella aunque no haya cambios para no repetir la comparación
+        user.perfil_hash = perfil_hash
+        try:
+            db.session.commit()
+            current_app.logger.info(f"Usuario sincronizado: {user.id_clerk}")
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error al actualizar usuario: {str(e)}")
+    
+    return user
+
+# Caché de tokens verificados: sha256(token) -> (claims, snapshot del usuario)
+_token_cache = None
+
+def get_token_cache():
+    """Obtiene la caché de tokens verificados del proceso"""
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TTLCache(
+            maxsize=current_app.config['AUTH_TOKEN_CACHE_SIZE'],
+            ttl=current_app.config['AUTH_TOKEN_CACHE_TTL']
+        )
+    return _token_cache
+
+def get_token_cache_stats():
+    """Estadísticas de aciertos/fallos de la caché de tokens"""
+    return get_token_cache().stats()
+
+def invalidate_cached_user(user_id):
+    """
+    Descartar los snapshots en caché de un usuario tras modificar su perfil.
+    Solo afecta al proceso actual; en los demás expiran por TTL.
+    """
+    return get_token_cache().delete_where(lambda _, value: value[1]['id_clerk'] == user_id)
+
+def _snapshot_user(user):
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+def _restore_user(snapshot):
+    """Adjuntar a la sesión un usuario a partir de su snapshot sin consultar la base de datos"""
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+def authenticate_token(token):
+    """
+    Resolver el usuario de un token Bearer, reutilizando la caché de tokens verificados.
+
+    Args:
+        token: Token JWT de Clerk
+
+    Returns:
+        User: Usuario autenticado o None si el token es inválido
+    """
+    cache = get_token_cache()
+    cache_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return _restore_user(cached[1])
+    
+    payload = verify_clerk_token(token)
+    if not payload:
+        return None
+    
+    user = get_or_create_user(payload)
+    
+    # La entrada nunca sobrevive al exp del token
+    ttl = min(payload['exp'] - time.time(), cache.ttl)
+    if ttl > 0:
+        cache.set(cache_key, (payload, _snapshot_user(user)), ttl=ttl)
     
     return user
 
@@ -184,13 +260,12 @@ def auth_required(f):
             return jsonify({'error': {'code': 'unauthorized', 'message': 'Token requerido'}}), 401
         
         token = auth_header.split(' ')[1]
-        payload = verify_clerk_token(token)
-        if not payload:
-            return jsonify({'error': {'code': 'invalid_token', 'message': 'Token inválido'}}), 401
         
         # Obtener o crear usuario
         try:
-            user = get_or_create_user(payload)
+            user = authenticate_token(token)
+            if not user:
+                return jsonify({'error': {'code': 'invalid_token', 'message': 'Token inválido'}}), 401
             g.current_user = user
             return f(*args, **kwargs)
         except Exception as e:
@@ -1,12 +1,11 @@
-import requests
 from flask import current_app
+from services.clerk_service import fetch_clerk_user
 
 class ClerkAPIClient:
     """Cliente para interactuar con la API de Clerk"""
     
     def __init__(self):
         self.api_key = current_app.config.get('CLERK_API_KEY')
-        self.base_url = "https://api.clerk.dev/v1"
         
     def get_user_data(self, user_id):
         """
@@ -21,27 +20,9 @@ class ClerkAPIClient:
         if not self.api_key:
             current_app.logger.error("CLERK_API_KEY no configurada")
             return None
-            
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
         
-        try:
-            response = requests.get(
-                f"{self.base_url}/users/{user_id}",
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                current_app.logger.error(f"Error al obtener datos de usuario: {response.status_code} - {response.text}")
-                return None
-                
-        except Exception as e:
-            current_app.logger.error(f"Error de conexión con Clerk API: {str(e)}")
-            return None
+        # Sesión HTTP compartida y caché por usuario (ver clerk_service.fetch_clerk_user)
+        return fetch_clerk_user(user_id)
             
     def get_user_email(self, user_id):
         """Obtiene el email principal del usuario"""
@@ -77,8 +58,8 @@ class ClerkAPIClient:
             
         try:
             # Intentar obtener el nombre completo
-            first_name = user_data.get('first_name', '')
-            last_name = user_data.get('last_name', '')
+            first_name = user_data.get('first_name') or ''
+            last_name = user_data.get('last_name') or ''
             
             if first_name or last_name:
                 return f"{first_name} {last_name}".strip()
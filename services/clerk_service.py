@@ -1,61 +1,145 @@
+import threading
 import requests
 from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from core.cache import TTLCache, SingleFlight
 
-def get_clerk_user_data(user_id):
+# Marca para usuarios que Clerk reportó como inexistentes (caché negativa)
+_NOT_FOUND = object()
+
+_session = None
+_session_lock = threading.Lock()
+_profile_cache = None
+_profile_flight = SingleFlight()
+
+def get_http_session():
     """
-    Obtiene datos de usuario directamente desde la API de Clerk
+    Obtiene la sesión HTTP compartida para llamadas a Clerk.
+
+    Reutiliza conexiones TCP/TLS entre peticiones y reintenta con backoff
+    exponencial los errores transitorios (429 y 5xx) de las peticiones GET.
     """
-    if not user_id:
-        current_app.logger.error("No se puede obtener datos de usuario: ID no proporcionado")
-        return None
-    
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=2,
+                    backoff_factor=0.3,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(['GET']),
+                    respect_retry_after_header=True,
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+def _get_profile_cache():
+    global _profile_cache
+    if _profile_cache is None:
+        _profile_cache = TTLCache(
+            maxsize=current_app.config['CLERK_PROFILE_CACHE_SIZE'],
+            ttl=current_app.config['CLERK_PROFILE_CACHE_TTL']
+        )
+    return _profile_cache
+
+def get_profile_cache_stats():
+    """Estadísticas de la caché de perfiles de Clerk"""
+    return _get_profile_cache().stats()
+
+def _request_clerk_user(user_id):
     api_key = current_app.config.get('CLERK_API_KEY')
     if not api_key:
         current_app.logger.error("No se puede obtener datos de usuario: CLERK_API_KEY no configurada")
         return None
-    
-    base_url = current_app.config.get('CLERK_API_BASE', 'https://api.clerk.dev/v1')
-    url = f"{base_url}/users/{user_id}"
-    
+
+    base_url = current_app.config.get('CLERK_API_BASE') or 'https://api.clerk.dev/v1'
     headers = {
         'Authorization': f'Bearer {api_key}',
         'Content-Type': 'application/json'
     }
-    
-    try:
-        current_app.logger.info(f"Consultando API de Clerk para usuario {user_id}")
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code != 200:
-            current_app.logger.error(f"Error al obtener datos de usuario desde Clerk: {response.status_code} - {response.text}")
-            return None
-        
+
+    current_app.logger.info(f"Consultando API de Clerk para usuario {user_id}")
+    response = get_http_session().get(
+        f"{base_url}/users/{user_id}",
+        headers=headers,
+        timeout=current_app.config['CLERK_HTTP_TIMEOUT']
+    )
+
+    cache = _get_profile_cache()
+    if response.status_code == 200:
         user_data = response.json()
-        current_app.logger.info(f"Datos de usuario obtenidos correctamente desde API de Clerk")
-        
-        # Extraer los datos relevantes
-        result = {
-            'id': user_data.get('id'),
-            'email': None,
-            'nombre_completo': None,
-            'first_name': user_data.get('first_name'),
-            'last_name': user_data.get('last_name'),
-            'image_url': user_data.get('image_url')
-        }
-        
-        # Obtener el email primario
-        email_addresses = user_data.get('email_addresses', [])
-        primary_email = next((email.get('email_address') for email in email_addresses 
-                             if email.get('id') == user_data.get('primary_email_address_id')), None)
-        
-        if primary_email:
-            result['email'] = primary_email
-        
-        # Construir nombre completo
-        if user_data.get('first_name') or user_data.get('last_name'):
-            result['nombre_completo'] = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
-        
-        return result
+        cache.set(user_id, user_data)
+        return user_data
+
+    if response.status_code == 404:
+        cache.set(user_id, _NOT_FOUND, ttl=current_app.config['CLERK_PROFILE_NEGATIVE_TTL'])
+
+    current_app.logger.error(f"Error al obtener datos de usuario desde Clerk: {response.status_code} - {response.text}")
+    return None
+
+def fetch_clerk_user(user_id):
+    """
+    Obtiene el usuario crudo de la API de Clerk, con caché por usuario.
+
+    Las respuestas 404 se guardan en caché negativa durante un tiempo menor y las
+    peticiones concurrentes para el mismo usuario comparten una única llamada.
+
+    Args:
+        user_id: ID del usuario en Clerk (sub del token JWT)
+
+    Returns:
+        dict: Respuesta de Clerk o None si no existe o hubo error
+    """
+    if not user_id:
+        current_app.logger.error("No se puede obtener datos de usuario: ID no proporcionado")
+        return None
+
+    cached = _get_profile_cache().get(user_id)
+    if cached is _NOT_FOUND:
+        return None
+    if cached is not None:
+        return cached
+
+    try:
+        return _profile_flight.do(user_id, lambda: _request_clerk_user(user_id))
     except Exception as e:
         current_app.logger.error(f"Error al consultar API de Clerk: {str(e)}")
         return None
+
+def get_clerk_user_data(user_id):
+    """
+    Obtiene datos de usuario directamente desde la API de Clerk
+    """
+    user_data = fetch_clerk_user(user_id)
+    if not user_data:
+        return None
+
+    # Extraer los datos relevantes
+    result = {
+        'id': user_data.get('id'),
+        'email': None,
+        'nombre_completo': None,
+        'first_name': user_data.get('first_name'),
+        'last_name': user_data.get('last_name'),
+        'image_url': user_data.get('image_url')
+    }
+
+    # Obtener el email primario
+    email_addresses = user_data.get('email_addresses', [])
+    primary_email = next((email.get('email_address') for email in email_addresses
+                         if email.get('id') == user_data.get('primary_email_address_id')), None)
+
+    if primary_email:
+        result['email'] = primary_email
+
+    # Construir nombre completo
+    if user_data.get('first_name') or user_data.get('last_name'):
+        result['nombre_completo'] = f"{user_data.get('first_name') or ''} {user_data.get('last_name') or ''}".strip()
+
+    return result
@@ -0,0 +1,154 @@
+from sqlalchemy import and_, case, delete, func, insert, or_, select
+from models import db, HabitEntry, DailyEntrySummary
+from core.db_util import DBUtil
+
+_STATE_FIELDS = {'exito': 'exitos', 'fallo': 'fallos'}
+
+def _raw_totals(user_id=None):
+    """Éxitos y fallos por (id_clerk, fecha) calculados desde habito_registros"""
+    totals = select(
+        HabitEntry.id_clerk.label('id_clerk'),
+        HabitEntry.fecha.label('fecha'),
+        func.sum(case((HabitEntry.estado == 'exito', 1), else_=0)).label('exitos'),
+        func.sum(case((HabitEntry.estado == 'fallo', 1), else_=0)).label('fallos')
+    ).group_by(HabitEntry.id_clerk, HabitEntry.fecha)
+    if user_id:
+        totals = totals.where(HabitEntry.id_clerk == user_id)
+    return totals
+
+def apply_daily_changes(changes):
+    """
+    Actualizar registro_resumen_diario tras crear, cambiar o borrar registros.
+
+    Suma los deltas por usuario y día y los aplica con un único upsert
+    incremental; no hace commit. Lo llama apply_entry_changes, así que cubre
+    todas las escrituras de registros.
+
+    Args:
+        changes: Tuplas (id_habito, id_clerk, fecha, estado_anterior, estado_nuevo)
+    """
+    deltas = {}
+    for _, user_id, fecha, before, after in changes:
+        if before == after:
+            continue
+        delta = deltas.setdefault((user_id, fecha), {'exitos': 0, 'fallos': 0})
+        if before:
+            delta[_STATE_FIELDS[before]] -= 1
+        if after:
+            delta[_STATE_FIELDS[after]] += 1
+
+    rows = [
+        {'id_clerk': user_id, 'fecha': fecha, **delta}
+        for (user_id, fecha), delta in deltas.items()
+        if delta['exitos'] or delta['fallos']
+    ]
+    if not rows:
+        return
+    db.session.execute(DBUtil.build_upsert(DailyEntrySummary, rows, conflict_columns=['id_clerk', 'fecha'], update={
+        'exitos': lambda table, inserted: table.c.exitos + inserted.exitos,
+        'fallos': lambda table, inserted: table.c.fallos + inserted.fallos
+    }))
+
+def remove_habit_from_rollup(habit_id):
+    """
+    Descontar del resumen diario todos los registros de un hábito antes de
+    borrarlos en bloque (p. ej. al eliminar el hábito). No hace commit.
+    """
+    entries = db.session.query(HabitEntry.id_clerk, HabitEntry.fecha, HabitEntry.estado).filter(
+        HabitEntry.id_habito == habit_id
+    )
+    apply_daily_changes([(habit_id, row.id_clerk, row.fecha, row.estado, None) for row in entries])
+
+def load_daily_totals(user_id, desde, hasta):
+    """
+    Éxitos y fallos por fecha de un usuario leídos del resumen diario (una fila
+    por día con registros, por clave primaria).
+
+    Returns:
+        dict: fecha -> (exitos, fallos)
+    """
+    rows = db.session.query(DailyEntrySummary.fecha, DailyEntrySummary.exitos, DailyEntrySummary.fallos).filter(
+        DailyEntrySummary.id_clerk == user_id,
+        DailyEntrySummary.fecha >= desde,
+        DailyEntrySummary.fecha <= hasta,
+        or_(DailyEntrySummary.exitos != 0, DailyEntrySummary.fallos != 0)
+    )
+    return {row.fecha: (row.exitos, row.fallos) for row in rows}
+
+def backfill_daily_rollup(user_id=None):
+    """
+    Reconstruir registro_resumen_diario desde habito_registros con un único
+    INSERT ... SELECT agrupado. Pensado para poblar la tabla tras la migración o
+    para reparar las diferencias que encuentre check_daily_rollup.
+
+    Args:
+        user_id: Limitar la reconstrucción a un usuario (por defecto todos)
+
+    Returns:
+        int: Filas creadas
+    """
+    rollup_delete = delete(DailyEntrySummary)
+    if user_id:
+        rollup_delete = rollup_delete.where(DailyEntrySummary.id_clerk == user_id)
+
+    db.session.execute(rollup_delete)
+    result = db.session.execute(insert(DailyEntrySummary).from_select(
+        ['id_clerk', 'fecha', 'exitos', 'fallos'],
+        _raw_totals(user_id)
+    ))
+    db.session.commit()
+    return result.rowcount or 0
+
+def check_daily_rollup(user_id=None, limit=100):
+    """
+    Comparar registro_resumen_diario con los totales calculados desde
+    habito_registros.
+
+    Busca días cuyo resumen no coincide (o falta) y filas del resumen con
+    valores distintos de cero para días sin registros.
+
+    Args:
+        user_id: Limitar la comprobación a un usuario (por defecto todos)
+        limit: Máximo de diferencias a devolver por cada tipo
+
+    Returns:
+        list: Diferencias {'id_clerk', 'fecha', 'esperado': (exitos, fallos), 'actual': (exitos, fallos)}
+    """
+    raw = _raw_totals(user_id).subquery()
+    rollup = DailyEntrySummary.__table__
+
+    mismatched = db.session.execute(select(
+        raw.c.id_clerk, raw.c.fecha, raw.c.exitos, raw.c.fallos,
+        rollup.c.exitos.label('resumen_exitos'), rollup.c.fallos.label('resumen_fallos')
+    ).select_from(raw.outerjoin(rollup, and_(
+        rollup.c.id_clerk == raw.c.id_clerk,
+        rollup.c.fecha == raw.c.fecha
+    ))).where(or_(
+        rollup.c.id_clerk.is_(None),
+        rollup.c.exitos != raw.c.exitos,
+        rollup.c.fallos != raw.c.fallos
+    )).limit(limit)).all()
+
+    orphans = select(rollup.c.id_clerk, rollup.c.fecha, rollup.c.exitos, rollup.c.fallos).where(
+        or_(rollup.c.exitos != 0, rollup.c.fallos != 0),
+        ~select(HabitEntry.id).where(
+            HabitEntry.id_clerk == rollup.c.id_clerk,
+            HabitEntry.fecha == rollup.c.fecha
+        ).exists()
+    )
+    if user_id:
+        orphans = orphans.where(rollup.c.id_clerk == user_id)
+
+    differences = [{
+        'id_clerk': row.id_clerk,
+        'fecha': row.fecha,
+        'esperado': (int(row.exitos or 0), int(row.fallos or 0)),
+        'actual': None if row.resumen_exitos is None else (row.resumen_exitos, row.resumen_fallos)
+    } for row in mismatched]
+    differences.extend({
+        'id_clerk': row.id_clerk,
+        'fecha': row.fecha,
+        'esperado': (0, 0),
+        'actual': (row.exitos, row.fallos)
+    } for row in db.session.execute(orphans.limit(limit)))
+    return differences
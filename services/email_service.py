@@ -1,14 +1,80 @@
-from flask import current_app, render_template
-from flask_mail import Message
-from config.mail_config import mail
+from flask import render_template
+from markupsafe import escape
+from models import db, EmailOutbox
+from core.cache import TTLCache
 import logging
+import secrets
 
 logger = logging.getLogger(__name__)
 
-def send_group_invitation(email, invitation_data):
+# Plantillas de invitación ya renderizadas por grupo e invitador, partidas por la URL de aceptación
+_invitation_cache = TTLCache(maxsize=256, ttl=3600)
+
+def enqueue_email(destinatario, asunto, html, tipo, referencia=None):
     """
-    Envía un correo electrónico de invitación para unirse a un grupo
-    
+    Encolar un correo en correo_salida para que lo envíe `flask mail send-outbox`.
+
+    No hace commit: el correo se guarda en la misma transacción que el cambio que
+    lo origina, así que solo se envía si ese cambio se confirma.
+
+    Args:
+        destinatario (str): Correo electrónico del destinatario
+        asunto (str): Asunto del correo
+        html (str): Cuerpo HTML ya renderizado
+        tipo (str): Tipo de correo (p. ej. 'invitacion_grupo')
+        referencia (str): ID del registro relacionado (opcional)
+
+    Returns:
+        EmailOutbox: Correo encolado
+    """
+    email = EmailOutbox(
+        destinatario=destinatario,
+        asunto=asunto,
+        html=html,
+        tipo=tipo,
+        referencia=referencia
+    )
+    db.session.add(email)
+    return email
+
+def get_group_invitation_renderer(invitation_data):
+    """
+    Renderizador de la invitación a un grupo que solo sustituye la URL de aceptación.
+
+    La plantilla se renderiza una vez por grupo e invitador con un marcador en
+    lugar de la URL y se guarda partida por ese marcador; cada destinatario solo
+    une las partes con su URL escapada. El resultado es idéntico a renderizar la
+    plantilla completa con `render_template`.
+
+    Args:
+        invitation_data (dict): Datos de la invitación (se ignora el token)
+
+    Returns:
+        callable: Función url_aceptar -> HTML
+    """
+    key = (
+        invitation_data['invitador_nombre'],
+        invitation_data['nombre_grupo'],
+        invitation_data.get('descripcion_grupo', 'Sin descripción')
+    )
+    parts = _invitation_cache.get(key)
+    if parts is None:
+        placeholder = f"url-aceptar-{secrets.token_hex(8)}"
+        parts = tuple(render_template(
+            'email/group_invitation.html',
+            invitador_nombre=key[0],
+            nombre_grupo=key[1],
+            descripcion_grupo=key[2],
+            url_aceptar=placeholder
+        ).split(placeholder))
+        _invitation_cache.set(key, parts)
+
+    return lambda url_aceptar: str(escape(url_aceptar)).join(parts)
+
+def enqueue_group_invitation(email, invitation_data, invitation_id=None):
+    """
+    Renderiza y encola el correo de invitación para unirse a un grupo
+
     Args:
         email (str): Correo electrónico del destinatario
         invitation_data (dict): Datos de la invitación con los siguientes campos:
@@ -17,33 +83,22 @@ def send_group_invitation(email, invitation_data):
             - descripcion_grupo: Descripción del grupo
             - token: Token de invitación
             - url_base: URL base de la aplicación (opcional)
+        invitation_id (str): ID de la invitación (opcional)
+
+    Returns:
+        EmailOutbox: Correo encolado
     """
-    try:
-        # Configurar la URL de aceptación
-        url_base = invitation_data.get('url_base', 'https://habitos.cvpx.lat')
-        url_aceptar = f"{url_base}/join-group?token={invitation_data['token']}"
-        
-        # Renderizar la plantilla HTML
-        html_content = render_template(
-            'email/group_invitation.html',
-            invitador_nombre=invitation_data['invitador_nombre'],
-            nombre_grupo=invitation_data['nombre_grupo'],
-            descripcion_grupo=invitation_data.get('descripcion_grupo', 'Sin descripción'),
-            url_aceptar=url_aceptar
-        )
-        
-        # Crear el mensaje
-        subject = f"Invitación al grupo {invitation_data['nombre_grupo']}"
-        msg = Message(
-            subject=subject,
-            recipients=[email],
-            html=html_content
-        )
-        
-        # Enviar el correo
-        mail.send(msg)
-        logger.info(f"Correo de invitación enviado a {email} para el grupo {invitation_data['nombre_grupo']}")
-        return True
-    except Exception as e:
-        logger.error(f"Error al enviar correo de invitación: {str(e)}")
-        return False
+    url_base = invitation_data.get('url_base', 'https://habitos.cvpx.lat')
+    html_content = get_group_invitation_renderer(invitation_data)(
+        f"{url_base}/join-group?token={invitation_data['token']}"
+    )
+
+    queued = enqueue_email(
+        email,
+        f"Invitación al grupo {invitation_data['nombre_grupo']}",
+        html_content,
+        'invitacion_grupo',
+        referencia=invitation_id
+    )
+    logger.info(f"Correo de invitación encolado para {email} (grupo {invitation_data['nombre_grupo']})")
+    return queued
@@ -0,0 +1,128 @@
+import uuid
+from datetime import datetime
+import pytz
+from models import db, HabitEntry
+from core.db_util import DBUtil
+from services.entry_stats_service import apply_entry_changes, get_entry_states
+
+ENTRY_KEY_COLUMNS = ['id_habito', 'id_clerk', 'fecha']
+
+def upsert_habit_entry(habit_id, user_id, fecha, estado, comentario, fecha_hora_local):
+    """
+    Crear o reemplazar el registro de un día con una sola sentencia
+    (INSERT ... ON DUPLICATE KEY UPDATE sobre uniq_registro, ON CONFLICT en SQLite).
+
+    Actualiza habito_contadores en la misma transacción. No hace commit: el
+    llamador confirma junto con la actualización de rachas.
+
+    Args:
+        habit_id: ID del hábito
+        user_id: ID del usuario
+        fecha: Día local del registro
+        estado: 'exito' o 'fallo'
+        comentario: Comentario del registro
+        fecha_hora_local: Momento del registro (se guarda en UTC)
+
+    Returns:
+        HabitEntry: Registro final del día
+    """
+    previous = get_entry_states([(habit_id, user_id, fecha)], lock=True)
+    now_utc = datetime.now(pytz.UTC)
+    db.session.execute(DBUtil.build_upsert(HabitEntry, {
+        'id': str(uuid.uuid4()),
+        'id_habito': habit_id,
+        'id_clerk': user_id,
+        'fecha': fecha,
+        'fecha_hora_local': fecha_hora_local,
+        'estado': estado,
+        'comentario': comentario,
+        'fecha_creacion': now_utc,
+        'fecha_actualizacion': now_utc
+    }, conflict_columns=ENTRY_KEY_COLUMNS, update=['estado', 'comentario', 'fecha_hora_local', 'fecha_actualizacion']))
+    apply_entry_changes([(habit_id, user_id, fecha, previous.get((habit_id, user_id, fecha)), estado)])
+
+    return HabitEntry.query.filter_by(
+        id_habito=habit_id,
+        id_clerk=user_id,
+        fecha=fecha
+    ).populate_existing().one()
+
+def upsert_habit_entries(user_id, rows):
+    """
+    Crear o reemplazar varios registros de un usuario con un único INSERT multi-fila
+    y leerlos de vuelta con una sola consulta.
+
+    Actualiza habito_contadores en la misma transacción. No hace commit.
+
+    Args:
+        user_id: ID del usuario
+        rows: Lista de dicts con id_habito, fecha, estado, comentario y fecha_hora_local
+              (sin pares (id_habito, fecha) repetidos)
+
+    Returns:
+        dict: (id_habito, fecha) -> HabitEntry
+    """
+    if not rows:
+        return {}
+
+    previous = get_entry_states([(row['id_habito'], user_id, row['fecha']) for row in rows], lock=True)
+    now_utc = datetime.now(pytz.UTC)
+    db.session.execute(DBUtil.build_upsert(HabitEntry, [{
+        'id': str(uuid.uuid4()),
+        'id_habito': row['id_habito'],
+        'id_clerk': user_id,
+        'fecha': row['fecha'],
+        'fecha_hora_local': row['fecha_hora_local'],
+        'estado': row['estado'],
+        'comentario': row.get('comentario'),
+        'fecha_creacion': now_utc,
+        'fecha_actualizacion': now_utc
+    } for row in rows], conflict_columns=ENTRY_KEY_COLUMNS, update=['estado', 'comentario', 'fecha_hora_local', 'fecha_actualizacion']))
+    apply_entry_changes([
+        (row['id_habito'], user_id, row['fecha'], previous.get((row['id_habito'], user_id, row['fecha'])), row['estado'])
+        for row in rows
+    ])
+
+    keys = {(row['id_habito'], row['fecha']) for row in rows}
+    entries = HabitEntry.query.filter(
+        HabitEntry.id_clerk == user_id,
+        HabitEntry.id_habito.in_({habit_id for habit_id, _ in keys}),
+        HabitEntry.fecha.in_({fecha for _, fecha in keys})
+    ).populate_existing().all()
+    return {(entry.id_habito, entry.fecha): entry for entry in entries if (entry.id_habito, entry.fecha) in keys}
+
+def insert_missing_entries(rows):
+    """
+    Insertar registros solo para los días que aún no tienen uno (p. ej. fallos
+    automáticos), sin tocar los existentes, y sumarlos a habito_contadores.
+
+    No hace commit.
+
+    Args:
+        rows: Filas completas de habito_registros (pueden ser de varios usuarios)
+
+    Returns:
+        int: Registros insertados
+    """
+    existing = get_entry_states([(row['id_habito'], row['id_clerk'], row['fecha']) for row in rows], lock=True)
+    new_rows = [row for row in rows if (row['id_habito'], row['id_clerk'], row['fecha']) not in existing]
+    if not new_rows:
+        return 0
+
+    db.session.execute(DBUtil.build_upsert(HabitEntry, new_rows, conflict_columns=ENTRY_KEY_COLUMNS))
+    apply_entry_changes([
+        (row['id_habito'], row['id_clerk'], row['fecha'], None, row['estado'])
+        for row in new_rows
+    ])
+    return len(new_rows)
+
+def remove_habit_entry(entry):
+    """
+    Borrar un registro y descontarlo de habito_contadores.
+
+    No hace commit: el llamador confirma junto con la actualización de rachas.
+    """
+    key = (entry.id_habito, entry.id_clerk, entry.fecha, entry.estado)
+    db.session.delete(entry)
+    db.session.flush()
+    apply_entry_changes([key + (None,)])
@@ -0,0 +1,226 @@
+from collections import namedtuple
+from sqlalchemy import case, delete, func, insert, select, tuple_
+from models import db, HabitEntry, HabitEntryCounter
+from core.db_util import DBUtil
+from services.leaderboard_service import invalidate_habit_leaderboards_on_commit
+from services.daily_rollup_service import apply_daily_changes
+
+EntryCounts = namedtuple('EntryCounts', ['total', 'exitos', 'fallos', 'primera_fecha', 'ultima_fecha'])
+EMPTY_COUNTS = EntryCounts(0, 0, 0, None, None)
+
+_STATE_FIELDS = {'exito': 'exitos', 'fallo': 'fallos'}
+
+def _counter_key():
+    return tuple_(HabitEntryCounter.id_habito, HabitEntryCounter.id_clerk)
+
+def _entry_key():
+    return tuple_(HabitEntry.id_habito, HabitEntry.id_clerk)
+
+def get_entry_states(keys, lock=False):
+    """
+    Estado actual de varios registros en una sola consulta.
+
+    Args:
+        keys: Tuplas (id_habito, id_clerk, fecha)
+        lock: Bloquear las filas existentes (SELECT ... FOR UPDATE) hasta el commit
+
+    Returns:
+        dict: (id_habito, id_clerk, fecha) -> estado, solo para los registros que existen
+    """
+    keys = list(set(keys))
+    if not keys:
+        return {}
+    query = db.session.query(HabitEntry.id_habito, HabitEntry.id_clerk, HabitEntry.fecha, HabitEntry.estado).filter(
+        tuple_(HabitEntry.id_habito, HabitEntry.id_clerk, HabitEntry.fecha).in_(keys)
+    )
+    if lock:
+        query = query.with_for_update()
+    return {(row.id_habito, row.id_clerk, row.fecha): row.estado for row in query}
+
+def _aggregate_counts(keys):
+    """Contadores calculados desde habito_registros para las claves (id_habito, id_clerk)"""
+    rows = db.session.query(
+        HabitEntry.id_habito,
+        HabitEntry.id_clerk,
+        func.count(HabitEntry.id).label('total'),
+        func.sum(case((HabitEntry.estado == 'exito', 1), else_=0)).label('exitos'),
+        func.sum(case((HabitEntry.estado == 'fallo', 1), else_=0)).label('fallos'),
+        func.min(HabitEntry.fecha).label('primera_fecha'),
+        func.max(HabitEntry.fecha).label('ultima_fecha')
+    ).filter(_entry_key().in_(keys)).group_by(HabitEntry.id_habito, HabitEntry.id_clerk).all()
+
+    result = {key: EMPTY_COUNTS for key in keys}
+    for row in rows:
+        result[(row.id_habito, row.id_clerk)] = EntryCounts(
+            row.total, int(row.exitos or 0), int(row.fallos or 0), row.primera_fecha, row.ultima_fecha
+        )
+    return result
+
+def _date_bounds(keys):
+    """Primera y última fecha registrada por clave (MIN/MAX sobre el índice uniq_registro)"""
+    rows = db.session.query(
+        HabitEntry.id_habito,
+        HabitEntry.id_clerk,
+        func.min(HabitEntry.fecha),
+        func.max(HabitEntry.fecha)
+    ).filter(_entry_key().in_(keys)).group_by(HabitEntry.id_habito, HabitEntry.id_clerk).all()
+    bounds = {key: (None, None) for key in keys}
+    for habit_id, user_id, first, last in rows:
+        bounds[(habit_id, user_id)] = (first, last)
+    return bounds
+
+def apply_entry_changes(changes):
+    """
+    Actualizar habito_contadores tras crear, cambiar o borrar registros.
+
+    Debe llamarse después de escribir los registros y dentro de la misma
+    transacción. Bloquea las filas de contadores afectadas, aplica los deltas y
+    solo vuelve a consultar MIN/MAX(fecha) cuando se borra la primera o la última
+    fecha. Si un contador aún no existe (tabla sin poblar) se crea desde el
+    historial del hábito. También mantiene registro_resumen_diario (ver
+    apply_daily_changes).
+
+    Args:
+        changes: Tuplas (id_habito, id_clerk, fecha, estado_anterior, estado_nuevo);
+                 estado_anterior None = registro nuevo, estado_nuevo None = borrado
+    """
+    deltas = {}
+    for habit_id, user_id, fecha, before, after in changes:
+        if before == after:
+            continue
+        delta = deltas.setdefault((habit_id, user_id), {
+            'total': 0, 'exitos': 0, 'fallos': 0, 'added': [], 'removed': []
+        })
+        if before:
+            delta['total'] -= 1
+            delta[_STATE_FIELDS[before]] -= 1
+            if after is None:
+                delta['removed'].append(fecha)
+        if after:
+            delta['total'] += 1
+            delta[_STATE_FIELDS[after]] += 1
+            if before is None:
+                delta['added'].append(fecha)
+    if not deltas:
+        return
+
+    invalidate_habit_leaderboards_on_commit({habit_id for habit_id, _ in deltas})
+    apply_daily_changes(changes)
+    keys = list(deltas)
+    counters = {
+        (counter.id_habito, counter.id_clerk): counter
+        for counter in HabitEntryCounter.query.filter(_counter_key().in_(keys)).populate_existing().with_for_update()
+    }
+
+    missing = [key for key in keys if key not in counters]
+    if missing:
+        db.session.execute(DBUtil.build_upsert(HabitEntryCounter, [
+            {'id_habito': habit_id, 'id_clerk': user_id, **counts._asdict()}
+            for (habit_id, user_id), counts in _aggregate_counts(missing).items()
+        ], conflict_columns=['id_habito', 'id_clerk'], update=list(EntryCounts._fields)))
+
+    stale_bounds = []
+    for key, counter in counters.items():
+        delta = deltas[key]
+        counter.total += delta['total']
+        counter.exitos += delta['exitos']
+        counter.fallos += delta['fallos']
+        for fecha in delta['added']:
+            counter.primera_fecha = fecha if counter.primera_fecha is None else min(counter.primera_fecha, fecha)
+            counter.ultima_fecha = fecha if counter.ultima_fecha is None else max(counter.ultima_fecha, fecha)
+        if any(fecha in (counter.primera_fecha, counter.ultima_fecha) for fecha in delta['removed']):
+            stale_bounds.append(key)
+
+    if stale_bounds:
+        for key, (first, last) in _date_bounds(stale_bounds).items():
+            counters[key].primera_fecha = first
+            counters[key].ultima_fecha = last
+
+    db.session.flush()
+
+def _load_counts(keys):
+    """Contadores por clave (id_habito, id_clerk); las claves sin fila se agregan desde el historial"""
+    rows = db.session.query(
+        HabitEntryCounter.id_habito,
+        HabitEntryCounter.id_clerk,
+        HabitEntryCounter.total,
+        HabitEntryCounter.exitos,
+        HabitEntryCounter.fallos,
+        HabitEntryCounter.primera_fecha,
+        HabitEntryCounter.ultima_fecha
+    ).filter(_counter_key().in_(keys)).all()
+    result = {(row.id_habito, row.id_clerk): EntryCounts(*row[2:]) for row in rows}
+
+    missing = [key for key in keys if key not in result]
+    if missing:
+        result.update(_aggregate_counts(missing))
+    return result
+
+def get_entry_counts(user_id, habit_ids):
+    """
+    Contadores de registros de varios hábitos de un usuario.
+
+    Lee una fila de habito_contadores por hábito; los hábitos sin fila (tabla aún
+    sin poblar) se calculan con una consulta agregada sin escribir nada.
+
+    Args:
+        user_id: ID del usuario
+        habit_ids: IDs de los hábitos
+
+    Returns:
+        dict: id_habito -> EntryCounts(total, exitos, fallos, primera_fecha, ultima_fecha)
+    """
+    keys = [(habit_id, user_id) for habit_id in dict.fromkeys(habit_ids)]
+    if not keys:
+        return {}
+    return {habit_id: counts for (habit_id, _), counts in _load_counts(keys).items()}
+
+def get_member_entry_counts(habit_id, user_ids):
+    """
+    Contadores de registros de un hábito para varios usuarios (miembros de un grupo).
+
+    Returns:
+        dict: id_clerk -> EntryCounts
+    """
+    keys = [(habit_id, user_id) for user_id in dict.fromkeys(user_ids)]
+    if not keys:
+        return {}
+    return {user_id: counts for (_, user_id), counts in _load_counts(keys).items()}
+
+def get_entry_count(habit_id, user_id):
+    """Contadores de registros de un hábito para un usuario"""
+    return get_entry_counts(user_id, [habit_id])[habit_id]
+
+def rebuild_counters(habit_id=None):
+    """
+    Reconstruir habito_contadores desde habito_registros con un único
+    INSERT ... SELECT agrupado. Pensado para poblar la tabla tras la migración o
+    para reparar inconsistencias.
+
+    Args:
+        habit_id: Limitar la reconstrucción a un hábito (por defecto todos)
+
+    Returns:
+        int: Contadores creados
+    """
+    counters_delete = delete(HabitEntryCounter)
+    totals = select(
+        HabitEntry.id_habito,
+        HabitEntry.id_clerk,
+        func.count(HabitEntry.id),
+        func.sum(case((HabitEntry.estado == 'exito', 1), else_=0)),
+        func.sum(case((HabitEntry.estado == 'fallo', 1), else_=0)),
+        func.min(HabitEntry.fecha),
+        func.max(HabitEntry.fecha)
+    ).group_by(HabitEntry.id_habito, HabitEntry.id_clerk)
+    if habit_id:
+        counters_delete = counters_delete.where(HabitEntryCounter.id_habito == habit_id)
+        totals = totals.where(HabitEntry.id_habito == habit_id)
+
+    db.session.execute(counters_delete)
+    result = db.session.execute(insert(HabitEntryCounter).from_select(
+        ['id_habito', 'id_clerk', 'total', 'exitos', 'fallos', 'primera_fecha', 'ultima_fecha'],
+        totals
+    ))
+    db.session.commit()
+    return result.rowcount or 0
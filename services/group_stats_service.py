@@ -0,0 +1,121 @@
+from sqlalchemy import func, or_
+from models import db, GroupMember, HabitEntry, User
+from core.pagination import decode_cursor, keyset_filter, split_page
+from services.entry_stats_service import get_member_entry_counts
+from services.habit_service import calculate_streaks_by_key
+from services.timezone_service import get_user_time_context
+
+RECENT_ENTRIES_LIMIT = 5
+
+def load_group_members(group_id, limit=None, cursor=None):
+    """
+    Miembros de un grupo con los datos de usuario necesarios en una sola consulta
+    (join grupo_miembros/usuarios).
+
+    Devuelve filas de columnas, no entidades, para que sigan siendo válidas tras
+    el commit del cálculo de rachas. Sin `limit` devuelve todos los miembros; con
+    `limit` pagina por id_clerk.
+
+    Args:
+        group_id: ID del grupo
+        limit: Tamaño de página (None = todos)
+        cursor: Cursor devuelto por la página anterior
+
+    Returns:
+        tuple: (filas con id_clerk, rol, nombre_completo, zona_horaria y cierre_dia_hora,
+                siguiente cursor o None)
+
+    Raises:
+        CursorError: Si el cursor no es válido
+    """
+    query = db.session.query(
+        GroupMember.id_clerk,
+        GroupMember.rol,
+        User.nombre_completo,
+        User.zona_horaria,
+        User.cierre_dia_hora
+    ).join(
+        User, User.id_clerk == GroupMember.id_clerk
+    ).filter(
+        GroupMember.id_grupo == group_id
+    ).order_by(GroupMember.id_clerk)
+
+    if limit is None:
+        return query.all(), None
+
+    after = decode_cursor(cursor, [str])
+    if after:
+        query = query.filter(keyset_filter([GroupMember.id_clerk], after))
+    return split_page(query.limit(limit + 1).all(), limit, key=lambda row: (row.id_clerk,))
+
+def get_members_progress(habit_id, users, fecha_local, recent_limit=RECENT_ENTRIES_LIMIT):
+    """
+    Progreso de varios usuarios en un hábito grupal con un número fijo de consultas.
+
+    Las rachas se calculan juntas para todos los usuarios (con el día local de
+    cada uno), los totales salen de habito_contadores y los registros recientes y
+    el de `fecha_local` de una sola consulta con ROW_NUMBER() por usuario.
+
+    Args:
+        habit_id: ID del hábito
+        users: Usuarios o filas con id_clerk, zona_horaria y cierre_dia_hora
+        fecha_local: Fecha local de quien consulta (para el registro de hoy)
+        recent_limit: Registros recientes por usuario
+
+    Returns:
+        dict: id_clerk -> progreso (rachas, totales, tasa de éxito, registro de hoy y recientes)
+    """
+    contexts = {user.id_clerk: get_user_time_context(user.id_clerk, user=user) for user in users}
+    user_ids = list(contexts)
+    if not user_ids:
+        return {}
+
+    # Primero las rachas: su commit puede insertar fallos automáticos que deben verse abajo
+    streaks = calculate_streaks_by_key([(habit_id, user_id) for user_id in user_ids], contexts)
+    counts = get_member_entry_counts(habit_id, user_ids)
+
+    ranked = db.session.query(
+        HabitEntry.id_clerk,
+        HabitEntry.fecha,
+        HabitEntry.estado,
+        HabitEntry.comentario,
+        func.row_number().over(
+            partition_by=HabitEntry.id_clerk,
+            order_by=HabitEntry.fecha.desc()
+        ).label('posicion')
+    ).filter(
+        HabitEntry.id_habito == habit_id,
+        HabitEntry.id_clerk.in_(user_ids)
+    ).subquery()
+    entries = {}
+    for row in db.session.query(ranked).filter(or_(
+        ranked.c.posicion <= recent_limit,
+        ranked.c.fecha == fecha_local
+    )).order_by(ranked.c.id_clerk, ranked.c.posicion):
+        entries.setdefault(row.id_clerk, []).append(row)
+
+    result = {}
+    for user_id in user_ids:
+        member_counts = counts[user_id]
+        member_entries = entries.get(user_id, [])
+        registro_hoy = next((entry for entry in member_entries if entry.fecha == fecha_local), None)
+        tasa_exito = (member_counts.exitos / member_counts.total * 100) if member_counts.total > 0 else 0
+
+        result[user_id] = {
+            'rachas': streaks[(habit_id, user_id)],
+            'total_registros': member_counts.total,
+            'total_exitos': member_counts.exitos,
+            'total_fallos': member_counts.fallos,
+            'tasa_exito': round(tasa_exito, 1),
+            'registro_hoy': {
+                'completado': registro_hoy is not None,
+                'estado': registro_hoy.estado if registro_hoy else None,
+                'comentario': registro_hoy.comentario if registro_hoy else None
+            },
+            'registros_recientes': [{
+                'fecha': entry.fecha.isoformat(),
+                'estado': entry.estado,
+                'comentario': entry.comentario
+            } for entry in member_entries if entry.posicion <= recent_limit]
+        }
+    return result
@@ -1,20 +1,200 @@
-from datetime import timedelta
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
 from models import db, Habit, HabitEntry, HabitStreak, GroupMember
-from sqlalchemy import or_
+from sqlalchemy import or_, case, tuple_, update
+from sqlalchemy.orm import joinedload
 
+from core.db_util import DBUtil
+from core.pagination import decode_cursor, keyset_filter, split_page
 from services.timezone_service import get_timezone_service
+from services.entry_service import insert_missing_entries
+from services.entry_stats_service import get_entry_counts
+from services.streak_runs_service import add_success_day, remove_success_day, get_current_streak, get_runs_summary
+
+EntrySummary = namedtuple('EntrySummary', [
+    'total', 'exitos', 'fallos', 'ultima_fecha', 'estado_hoy', 'comentario_hoy',
+    'ultimo_estado', 'ultimo_comentario', 'ultimo_fecha_hora_local'
+])
+
+AUTO_FAILURE_COMMENT = 'Registro automático - No se completó el hábito'
+
+def resolve_streak_breaks(active_keys, yesterday_states):
+    """
+    Decidir qué rachas activas se rompen al cambiar de día.
+    
+    Args:
+        active_keys: Claves de las rachas con racha_actual > 0
+        yesterday_states: clave -> estado del registro de ayer ('exito'/'fallo')
+        
+    Returns:
+        tuple: (claves que se rompen, claves que además necesitan fallo automático)
+    """
+    broken = [key for key in active_keys if yesterday_states.get(key) != 'exito']
+    auto_failures = [key for key in broken if key not in yesterday_states]
+    return broken, auto_failures
+
+def auto_failure_row(habit_id, user_id, fecha, fecha_hora_local):
+    """Fila de habito_registros para un fallo automático"""
+    return {
+        'id': str(uuid.uuid4()),
+        'id_habito': habit_id,
+        'id_clerk': user_id,
+        'fecha': fecha,
+        'fecha_hora_local': fecha_hora_local,
+        'estado': 'fallo',
+        'comentario': AUTO_FAILURE_COMMENT
+    }
+
+def calculate_streaks_by_key(keys, contexts):
+    """
+    Calcular rachas para pares (hábito, usuario) con verificación diaria de ruptura.
+    
+    Lee todas las rachas y los registros de ayer de cada usuario en dos consultas,
+    aplica en memoria la lógica de ruptura/fallo automático y persiste los cambios
+    con escrituras en bloque y un único commit (solo si alguna racha no se había
+    revisado hoy).
+    
+    Con STREAK_ROLLOVER_ENABLED el cambio de día lo persiste el job de rollover
+    (`flask streaks rollover`) y esta función solo lee: si el job aún no pasó por
+    una racha, la ruptura se refleja en el resultado sin escribirla.
+    
+    Args:
+        keys: Pares (id_habito, id_clerk)
+        contexts: id_clerk -> UserTimeContext de cada usuario de `keys`
+        
+    Returns:
+        dict: (id_habito, id_clerk) -> {'actual': int, 'mejor': int}
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    
+    read_only = current_app.config.get('STREAK_ROLLOVER_ENABLED', False)
+    
+    rows = db.session.query(
+        HabitStreak.id_habito,
+        HabitStreak.id_clerk,
+        HabitStreak.racha_actual,
+        HabitStreak.mejor_racha,
+        HabitStreak.ultima_revision_local
+    ).filter(
+        tuple_(HabitStreak.id_habito, HabitStreak.id_clerk).in_(keys)
+    ).all()
+    streaks = {(row.id_habito, row.id_clerk): row for row in rows}
+    result = {key: {'actual': row.racha_actual or 0, 'mejor': row.mejor_racha or 0} for key, row in streaks.items()}
+    
+    missing = [key for key in keys if key not in streaks]
+    for key in missing:
+        result[key] = {'actual': 0, 'mejor': 0}
+    
+    # Rachas que aún no se revisaron hoy (según el día local de cada usuario)
+    pending = [key for key, row in streaks.items() if row.ultima_revision_local != contexts[key[1]].today]
+    active = [key for key in pending if (streaks[key].racha_actual or 0) > 0]
+    
+    broken, auto_failures = [], []
+    if active:
+        yesterday = {
+            (row.id_habito, row.id_clerk): row.estado
+            for row in db.session.query(HabitEntry.id_habito, HabitEntry.id_clerk, HabitEntry.estado).filter(
+                tuple_(HabitEntry.id_habito, HabitEntry.id_clerk, HabitEntry.fecha).in_([
+                    (habit_id, user_id, contexts[user_id].yesterday) for habit_id, user_id in active
+                ])
+            )
+        }
+        broken, auto_failures = resolve_streak_breaks(active, yesterday)
+        for key in broken:
+            result[key]['actual'] = 0
+    
+    if read_only or not (missing or pending):
+        return result
+    
+    # Crear los registros de racha que falten (ya quedan revisados hoy)
+    if missing:
+        db.session.execute(DBUtil.build_upsert(HabitStreak, [{
+            'id_habito': habit_id,
+            'id_clerk': user_id,
+            'racha_actual': 0,
+            'mejor_racha': 0,
+            'ultima_fecha': None,
+            'ultima_revision_local': contexts[user_id].today
+        } for habit_id, user_id in missing], conflict_columns=['id_habito', 'id_clerk']))
+    
+    if auto_failures:
+        insert_missing_entries([
+            auto_failure_row(habit_id, user_id, contexts[user_id].yesterday, contexts[user_id].now_local)
+            for habit_id, user_id in auto_failures
+        ])
+    
+    # Un UPDATE por cada día local distinto (normalmente uno)
+    pending_by_day = {}
+    for key in pending:
+        pending_by_day.setdefault(contexts[key[1]].today, []).append(key)
+    for hoy_local, day_keys in pending_by_day.items():
+        values = {'ultima_revision_local': hoy_local}
+        day_set = set(day_keys)
+        day_broken = [key for key in broken if key in day_set]
+        if day_broken:
+            values['racha_actual'] = case(
+                (tuple_(HabitStreak.id_habito, HabitStreak.id_clerk).in_(day_broken), 0),
+                else_=HabitStreak.racha_actual
+            )
+        db.session.execute(
+            update(HabitStreak)
+            .where(tuple_(HabitStreak.id_habito, HabitStreak.id_clerk).in_(day_keys))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    
+    db.session.commit()
+    return result
+
+def calculate_streaks(user_id, habit_ids):
+    """
+    Calcular las rachas de varios hábitos de un usuario con verificación diaria de ruptura.
+    
+    Args:
+        user_id: ID del usuario
+        habit_ids: IDs de los hábitos a evaluar
+        
+    Returns:
+        dict: id_habito -> {'actual': int, 'mejor': int}
+    """
+    habit_ids = list(dict.fromkeys(habit_ids))
+    if not habit_ids:
+        return {}
+    
+    time_context = get_timezone_service().get_user_time_context(user_id)
+    result = calculate_streaks_by_key([(habit_id, user_id) for habit_id in habit_ids], {user_id: time_context})
+    return {habit_id: result[(habit_id, user_id)] for habit_id in habit_ids}
 
 def calculate_streak(habit_id, user_id):
     """Calcular racha con verificación diaria de ruptura"""
-    timezone_service = get_timezone_service()
-    hoy_local = timezone_service.get_user_local_date(user_id)
-    ayer_local = hoy_local - timedelta(days=1)
+    return calculate_streaks(user_id, [habit_id])[habit_id]
+
+def apply_streak_changes(habit_id, user_id, changes, commit=True):
+    """
+    Ajustar los tramos de racha para uno o varios días y refrescar habito_rachas una vez.
     
-    # Obtener o crear registro de racha
-    streak_record = HabitStreak.query.filter_by(id_habito=habit_id, id_clerk=user_id).first()
+    Solo se leen los tramos vecinos de cada día y el tramo actual, sin recorrer el
+    historial; mejor_racha se recalcula con MAX(longitud) solo cuando algún tramo se
+    recorta o se parte.
+    
+    Args:
+        habit_id: ID del hábito
+        user_id: ID del usuario
+        changes: Lista de (fecha, es_exito)
+        commit: Si es False los cambios quedan en la transacción del llamador
+        
+    Returns:
+        dict: {'actual': int, 'mejor': int}
+    """
+    hoy_local = get_timezone_service().get_user_local_date(user_id)
     
+    # Bloquear la fila de racha serializa las escrituras concurrentes del mismo hábito y usuario
+    streak_record = HabitStreak.query.filter_by(id_habito=habit_id, id_clerk=user_id).with_for_update().first()
     if not streak_record:
-        # Crear nuevo registro de racha
         streak_record = HabitStreak(
             id_habito=habit_id,
             id_clerk=user_id,
@@ -24,125 +204,174 @@ def calculate_streak(habit_id, user_id):
             ultima_revision_local=hoy_local
         )
         db.session.add(streak_record)
-        db.session.commit()
-        return {'actual': 0, 'mejor': 0}
-    
-    # Verificar si ya revisamos hoy
-    if streak_record.ultima_revision_local == hoy_local:
-        return {'actual': streak_record.racha_actual, 'mejor': streak_record.mejor_racha}
     
-    # Verificar entrada de ayer
-    yesterday_entry = HabitEntry.query.filter_by(
-        id_habito=habit_id,
-        id_clerk=user_id,
-        fecha=ayer_local
-    ).first()
-    
-    # Actualizar racha basada en el estado de ayer
-    if yesterday_entry and yesterday_entry.estado == 'exito':
-        # La racha continúa (no cambiar racha_actual)
-        pass
-    else:
-        # Verificar si había una racha activa
-        if streak_record.racha_actual > 0:
-            # Si había una racha activa, registrar fallo automáticamente
-            hora_local = timezone_service.get_user_local_datetime(user_id)
-            fallo_automatico = HabitEntry(
-                id_habito=habit_id,
-                id_clerk=user_id,
-                fecha=ayer_local,
-                fecha_hora_local=hora_local,
-                estado='fallo',
-                comentario='Registro automático - No se completó el hábito'
-            )
-            db.session.add(fallo_automatico)
-            # La racha se rompe
-            streak_record.racha_actual = 0
-        else:
-            # Si no había racha activa (racha_actual = 0), no registrar fallo
-            pass
+    best = streak_record.mejor_racha or 0
+    last_success = streak_record.ultima_fecha
+    runs_shrunk = False
+    for fecha, success in changes:
+        if success:
+            best = max(best, add_success_day(habit_id, user_id, fecha))
+            if not last_success or fecha > last_success:
+                last_success = fecha
+        elif remove_success_day(habit_id, user_id, fecha):
+            runs_shrunk = True
     
+    db.session.flush()
+    if runs_shrunk:
+        best, last_success = get_runs_summary(habit_id, user_id)
+    streak_record.mejor_racha = best
+    streak_record.ultima_fecha = last_success
+    streak_record.racha_actual = get_current_streak(habit_id, user_id, hoy_local)
     streak_record.ultima_revision_local = hoy_local
-    db.session.commit()
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
     
     return {'actual': streak_record.racha_actual, 'mejor': streak_record.mejor_racha}
 
-def update_streak_on_entry(habit_id, user_id, fecha, estado):
-    """Actualizar racha cuando se crea un nuevo registro"""
-    timezone_service = get_timezone_service()
-    hoy_local = timezone_service.get_user_local_date(user_id)
-    ayer_local = hoy_local - timedelta(days=1)
+def update_streak_on_entry(habit_id, user_id, fecha, estado, commit=True):
+    """
+    Actualizar racha cuando se crea o cambia un registro (también registros históricos).
+    Con commit=False los cambios quedan en la transacción del llamador.
+    """
+    return apply_streak_changes(habit_id, user_id, [(fecha, estado == 'exito')], commit=commit)
+
+def update_streak_on_removal(habit_id, user_id, fecha):
+    """Actualizar racha cuando se elimina un registro"""
+    return apply_streak_changes(habit_id, user_id, [(fecha, False)])
+
+def load_habits_by_ids(habit_ids, user_id):
+    """
+    Cargar hábitos por ID, con su grupo y sus rachas, conservando el orden de `habit_ids`.
     
-    # Obtener o crear registro de racha
-    streak_record = HabitStreak.query.filter_by(id_habito=habit_id, id_clerk=user_id).first()
+    Las rachas se calculan antes de cargar los hábitos porque pueden hacer commit
+    y expirar objetos ya cargados.
     
-    if not streak_record:
-        streak_record = HabitStreak(
-            id_habito=habit_id,
-            id_clerk=user_id,
-            racha_actual=0,
-            mejor_racha=0,
-            ultima_fecha=None,
-            ultima_revision_local=hoy_local
-        )
-        db.session.add(streak_record)
+    Returns:
+        tuple: (lista de Habit, dict id_habito -> {'actual', 'mejor'})
+    """
+    rachas = calculate_streaks(user_id, habit_ids)
+    if not habit_ids:
+        return [], rachas
+    
+    habits = Habit.query.options(joinedload(Habit.group)).filter(Habit.id.in_(habit_ids)).all()
+    position = {habit_id: index for index, habit_id in enumerate(habit_ids)}
+    habits.sort(key=lambda habit: position[habit.id])
+    return habits, rachas
+
+def load_habits_with_streaks(habits_query, user_id):
+    """
+    Cargar los hábitos de una consulta junto con sus rachas en un número fijo de consultas.
     
-    if estado == 'exito':
-        # Verificar si ayer también fue un éxito
-        if fecha == hoy_local:  # Registro de hoy
-            yesterday_entry = HabitEntry.query.filter_by(
-                id_habito=habit_id,
-                id_clerk=user_id,
-                fecha=ayer_local
-            ).first()
-            
-            if yesterday_entry and yesterday_entry.estado == 'exito':
-                # Continuar racha
-                streak_record.racha_actual += 1
-            else:
-                # Iniciar nueva racha
-                streak_record.racha_actual = 1
-        else:
-            # Entrada histórica - recalcular desde cero
-            entries = HabitEntry.query.filter_by(
-                id_habito=habit_id,
-                id_clerk=user_id,
-                estado='exito'
-            ).order_by(HabitEntry.fecha.desc()).all()
-            
-            if entries:
-                # Calcular racha actual desde la fecha más reciente
-                current_streak = 0
-                check_date = entries[0].fecha
-                
-                for entry in entries:
-                    if entry.fecha == check_date:
-                        current_streak += 1
-                        check_date -= timedelta(days=1)
-                    else:
-                        break
-                
-                streak_record.racha_actual = current_streak
-            else:
-                streak_record.racha_actual = 1
+    Primero se obtienen solo los IDs y luego se usa `load_habits_by_ids`, conservando
+    el orden de la consulta original.
+    
+    Args:
+        habits_query: Consulta de Habit (puede incluir orden, offset y límite)
+        user_id: ID del usuario
         
-        # Actualizar mejor racha
-        if streak_record.racha_actual > streak_record.mejor_racha:
-            streak_record.mejor_racha = streak_record.racha_actual
+    Returns:
+        tuple: (lista de Habit, dict id_habito -> {'actual', 'mejor'})
+    """
+    habit_ids = [row.id for row in habits_query.with_entities(Habit.id).all()]
+    return load_habits_by_ids(habit_ids, user_id)
+
+def load_habits_page_by_cursor(habits_query, user_id, cursor, limit):
+    """
+    Página de hábitos por cursor (keyset) ordenada por (fecha_creacion, id).
+    
+    Args:
+        habits_query: Consulta de Habit con los filtros del listado
+        user_id: ID del usuario
+        cursor: Cursor recibido (vacío para la primera página)
+        limit: Tamaño de página
         
-        # Actualizar última fecha
-        streak_record.ultima_fecha = fecha
+    Returns:
+        tuple: (lista de Habit, dict de rachas, siguiente cursor o None)
         
-    elif estado == 'fallo':
-        # La racha se rompe
-        streak_record.racha_actual = 0
-        # No actualizar ultima_fecha en caso de fallos
+    Raises:
+        CursorError: Si el cursor no es válido
+    """
+    order = [Habit.fecha_creacion, Habit.id]
+    after = decode_cursor(cursor, [datetime.fromisoformat, str])
+    if after:
+        habits_query = habits_query.filter(keyset_filter(order, after))
+    keys = habits_query.with_entities(Habit.id, Habit.fecha_creacion).order_by(*order).limit(limit + 1).all()
+    keys, next_cursor = split_page(keys, limit, lambda row: (row.fecha_creacion, row.id))
+    habits, rachas = load_habits_by_ids([row.id for row in keys], user_id)
+    return habits, rachas, next_cursor
+
+def get_today_entries(user_id, habit_ids, hoy_local):
+    """
+    Registros de hoy del usuario para varios hábitos en una sola consulta IN.
     
-    # Actualizar fecha de revisión
-    streak_record.ultima_revision_local = hoy_local
-    db.session.commit()
+    Returns:
+        dict: id_habito -> HabitEntry
+    """
+    if not habit_ids:
+        return {}
+    entries = HabitEntry.query.filter(
+        HabitEntry.id_clerk == user_id,
+        HabitEntry.fecha == hoy_local,
+        HabitEntry.id_habito.in_(habit_ids)
+    ).all()
+    return {entry.id_habito: entry for entry in entries}
+
+def get_entry_summaries(user_id, habit_ids, hoy_local):
+    """
+    Resumen de registros por hábito a partir de habito_contadores.
     
-    return {'actual': streak_record.racha_actual, 'mejor': streak_record.mejor_racha}
+    Los totales salen de una fila de contadores por hábito y el último registro y
+    el de hoy se leen juntos con una búsqueda puntual por (hábito, fecha) sobre
+    uniq_registro, sin recorrer el historial.
+    
+    Args:
+        user_id: ID del usuario
+        habit_ids: IDs de los hábitos
+        hoy_local: Fecha local actual del usuario
+        
+    Returns:
+        dict: id_habito -> EntrySummary con total, exitos, fallos, ultima_fecha, estado_hoy,
+              comentario_hoy, ultimo_estado, ultimo_comentario, ultimo_fecha_hora_local
+              (solo hábitos con registros)
+    """
+    counts = {habit_id: row for habit_id, row in get_entry_counts(user_id, habit_ids).items() if row.total}
+    if not counts:
+        return {}
+    
+    keys = {(habit_id, row.ultima_fecha) for habit_id, row in counts.items()}
+    keys.update((habit_id, hoy_local) for habit_id in counts)
+    entries = {
+        (row.id_habito, row.fecha): row
+        for row in db.session.query(
+            HabitEntry.id_habito,
+            HabitEntry.fecha,
+            HabitEntry.estado,
+            HabitEntry.comentario,
+            HabitEntry.fecha_hora_local
+        ).filter(
+            HabitEntry.id_clerk == user_id,
+            tuple_(HabitEntry.id_habito, HabitEntry.fecha).in_(list(keys))
+        )
+    }
+    
+    result = {}
+    for habit_id, row in counts.items():
+        today = entries.get((habit_id, hoy_local))
+        last = entries.get((habit_id, row.ultima_fecha))
+        result[habit_id] = EntrySummary(
+            total=row.total,
+            exitos=row.exitos,
+            fallos=row.fallos,
+            ultima_fecha=row.ultima_fecha,
+            estado_hoy=today.estado if today else None,
+            comentario_hoy=today.comentario if today else None,
+            ultimo_estado=last.estado if last else None,
+            ultimo_comentario=last.comentario if last else None,
+            ultimo_fecha_hora_local=last.fecha_hora_local if last else None
+        )
+    return result
 
 def user_has_access_to_habit(habit_id, user_id):
     """Verificar si un usuario tiene acceso a un hábito"""
@@ -164,6 +393,27 @@ def user_has_access_to_habit(habit_id, user_id):
     
     return False
 
+def get_accessible_habit_ids(habit_ids, user_id):
+    """
+    Filtrar en una sola consulta los hábitos a los que el usuario tiene acceso
+    (propios o de grupos de los que es miembro).
+    
+    Returns:
+        set: IDs accesibles
+    """
+    if not habit_ids:
+        return set()
+    rows = db.session.query(Habit.id).filter(
+        Habit.id.in_(set(habit_ids)),
+        or_(
+            Habit.id_propietario == user_id,
+            Habit.id_grupo.in_(
+                db.session.query(GroupMember.id_grupo).filter_by(id_clerk=user_id)
+            )
+        )
+    ).all()
+    return {row.id for row in rows}
+
 def can_edit_habit(habit_id, user_id):
     """Verificar si un usuario puede editar un hábito"""
     habit = Habit.query.get(habit_id)
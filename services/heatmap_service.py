@@ -0,0 +1,105 @@
+import base64
+import sys
+from array import array
+from datetime import timedelta
+from services.report_service import get_daily_totals
+
+HEATMAP_DEFAULT_WEEKS = 53
+HEATMAP_MAX_WEEKS = 520
+HEATMAP_ENCODING = 'base64-uint16le'
+_MAX_VALUE = 0xFFFF
+
+def get_heatmap_range(hoy_local, weeks):
+    """
+    Rango de días del heatmap: desde el domingo de hace `weeks - 1` semanas
+    hasta hoy (la última semana queda incompleta, como en GitHub).
+
+    Args:
+        hoy_local: Fecha local del usuario (zona horaria y hora de cierre aplicadas)
+        weeks: Número de semanas (columnas)
+
+    Returns:
+        tuple: (inicio, fin) inclusive
+    """
+    domingo = hoy_local - timedelta(days=(hoy_local.weekday() + 1) % 7)
+    return domingo - timedelta(weeks=weeks - 1), hoy_local
+
+def build_success_grid(user_id, inicio, fin):
+    """
+    Éxitos por día como arreglo compacto de enteros sin signo de 16 bits.
+
+    Una sola consulta agregada por fecha; la posición `i` del arreglo es el día
+    `inicio + i`, de modo que rellenar el calendario es indexar y no recorrer
+    fechas.
+
+    Returns:
+        array: array('H') con un valor por día del rango
+    """
+    grid = array('H', bytes(2 * ((fin - inicio).days + 1)))
+    for fecha, (exitos, _) in get_daily_totals(user_id, inicio, fin).items():
+        grid[(fecha - inicio).days] = min(exitos, _MAX_VALUE)
+    return grid
+
+def encode_grid(grid):
+    """Codificar el arreglo de días como base64 de uint16 little-endian"""
+    if sys.byteorder != 'little':
+        grid = array('H', grid)
+        grid.byteswap()
+    return base64.b64encode(grid.tobytes()).decode('ascii')
+
+def load_activity_heatmap(user_id, hoy_local, weeks=HEATMAP_DEFAULT_WEEKS, compact=False):
+    """
+    Heatmap de éxitos diarios al estilo GitHub en la fecha local del usuario.
+
+    Las semanas empiezan en domingo (`day_of_week` 0) y `week_index` cuenta
+    desde la primera semana del rango. Con `compact` no se devuelve la lista de
+    semanas sino todos los valores en `valores` (base64 de uint16
+    little-endian, un valor por día desde `rango_fechas.inicio`), pensado para
+    rangos largos.
+
+    Args:
+        user_id: ID del usuario
+        hoy_local: Fecha local actual del usuario
+        weeks: Número de semanas
+        compact: Devolver los valores codificados en lugar de la lista de semanas
+
+    Returns:
+        dict: periodo_semanas, rango_fechas, estadisticas y heatmap (o codificacion/valores)
+    """
+    inicio, fin = get_heatmap_range(hoy_local, weeks)
+    grid = build_success_grid(user_id, inicio, fin)
+
+    total_dias = len(grid)
+    total_exitos = sum(grid)
+    dias_con_actividad = total_dias - grid.count(0)
+
+    result = {
+        'periodo_semanas': weeks,
+        'rango_fechas': {
+            'inicio': inicio.isoformat(),
+            'fin': fin.isoformat()
+        },
+        'estadisticas': {
+            'total_dias': total_dias,
+            'dias_con_actividad': dias_con_actividad,
+            'total_exitos': total_exitos,
+            'porcentaje_actividad': round(dias_con_actividad * 100 / total_dias if total_dias > 0 else 0, 1),
+            'promedio_diario': round(total_exitos / total_dias if total_dias > 0 else 0, 2),
+            'mejor_dia': max(grid, default=0)
+        }
+    }
+
+    if compact:
+        result['codificacion'] = HEATMAP_ENCODING
+        result['valores'] = encode_grid(grid)
+        return result
+
+    result['heatmap'] = [{
+        'week_index': week,
+        'days': [{
+            'day_of_week': offset - week * 7,
+            'value': grid[offset],
+            'date': (inicio + timedelta(days=offset)).isoformat()
+        } for offset in range(week * 7, min(week * 7 + 7, total_dias))]
+    } for week in range((total_dias + 6) // 7)]
+    return result
@@ -0,0 +1,139 @@
+import re
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update
+from models import db, GroupInvite, GroupMember, User
+from services.email_service import enqueue_group_invitation
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+INVITE_TTL = timedelta(days=7)
+
+def normalize_invite_emails(correos):
+    """
+    Validar y deduplicar una lista de correos conservando el orden.
+
+    Los duplicados se detectan sin distinguir mayúsculas.
+
+    Args:
+        correos: Lista recibida en la petición
+
+    Returns:
+        tuple: (correos válidos y únicos, errores [{'correo', 'error'}])
+    """
+    valid = []
+    errores = []
+    seen = set()
+    for correo in correos:
+        if not isinstance(correo, str) or not EMAIL_PATTERN.match(correo.strip()):
+            errores.append({'correo': correo, 'error': 'Formato de correo inválido'})
+            continue
+        correo = correo.strip()
+        if correo.lower() in seen:
+            errores.append({'correo': correo, 'error': 'Correo duplicado en la solicitud'})
+            continue
+        seen.add(correo.lower())
+        valid.append(correo)
+    return valid, errores
+
+def create_invites_bulk(group, inviter_id, inviter_name, correos, rol, url_base):
+    """
+    Crear invitaciones a un grupo para varios correos en una sola pasada.
+
+    Descarta con una consulta IN cada una los correos que ya tienen una
+    invitación pendiente en el grupo y los que pertenecen a miembros, inserta
+    todas las invitaciones con un único INSERT de varias filas y encola los
+    correos en correo_salida. No hace commit: invitaciones y correos se
+    confirman juntos.
+
+    Args:
+        group: Grupo al que se invita
+        inviter_id: ID de quien invita
+        inviter_name: Nombre mostrado en el correo
+        correos: Correos ya validados y deduplicados (ver normalize_invite_emails)
+        rol: Rol con el que entrarán los invitados
+        url_base: URL base del frontend para el enlace de aceptación
+
+    Returns:
+        tuple: (invitaciones creadas, errores [{'correo', 'error'}])
+    """
+    if not correos:
+        return [], []
+    now = datetime.utcnow()
+
+    pending = {row.correo_invitado.lower() for row in db.session.query(GroupInvite.correo_invitado).filter(
+        GroupInvite.id_grupo == group.id,
+        GroupInvite.estado == 'pendiente',
+        GroupInvite.expira_en > now,
+        GroupInvite.correo_invitado.in_(correos)
+    )}
+    members = {row.correo.lower() for row in db.session.query(User.correo).join(
+        GroupMember, GroupMember.id_clerk == User.id_clerk
+    ).filter(
+        GroupMember.id_grupo == group.id,
+        User.correo.in_(correos)
+    )}
+
+    errores = []
+    rows = []
+    expira_en = now + INVITE_TTL
+    for correo in correos:
+        if correo.lower() in members:
+            errores.append({'correo': correo, 'error': 'Ya es miembro del grupo'})
+        elif correo.lower() in pending:
+            errores.append({'correo': correo, 'error': 'Ya tiene una invitación pendiente'})
+        else:
+            rows.append({
+                'id': str(uuid.uuid4()),
+                'id_grupo': group.id,
+                'id_invitador': inviter_id,
+                'correo_invitado': correo,
+                'token': secrets.token_hex(32),
+                'estado': 'pendiente',
+                'expira_en': expira_en,
+                'rol': rol,
+                'fecha_creacion': now
+            })
+    if not rows:
+        return [], errores
+
+    db.session.execute(insert(GroupInvite).values(rows))
+
+    invitation_data = {
+        'invitador_nombre': inviter_name,
+        'nombre_grupo': group.nombre,
+        'descripcion_grupo': group.descripcion or "Sin descripción",
+        'url_base': url_base
+    }
+    for row in rows:
+        enqueue_group_invitation(row['correo_invitado'], {**invitation_data, 'token': row['token']}, row['id'])
+
+    return [{
+        'id': row['id'],
+        'token': row['token'],
+        'correo_invitado': row['correo_invitado'],
+        'expira_en': row['expira_en'].isoformat()
+    } for row in rows], errores
+
+def expire_pending_invites(now=None):
+    """
+    Marcar como 'expirada' todas las invitaciones pendientes ya vencidas con un
+    único UPDATE (usa el índice idx_inv_estado_expira).
+
+    Las lecturas no escriben el estado: tratan como expirada cualquier
+    invitación pendiente vencida, y este barrido periódico lo persiste.
+
+    Args:
+        now: Momento de referencia en UTC (por defecto ahora)
+
+    Returns:
+        int: Invitaciones expiradas
+    """
+    result = db.session.execute(
+        update(GroupInvite)
+        .where(GroupInvite.estado == 'pendiente', GroupInvite.expira_en < (now or datetime.utcnow()))
+        .values(estado='expirada')
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount or 0
@@ -0,0 +1,122 @@
+import threading
+import time
+import logging
+import jwt
+from services.clerk_service import get_http_session
+
+logger = logging.getLogger(__name__)
+
+class JWKSCache:
+    """
+    Caché en proceso del JWKS de Clerk.
+
+    Las claves se descargan una vez y se reutilizan durante `ttl` segundos. Si llega
+    un token con un `kid` desconocido (rotación de claves) se fuerza una recarga.
+    Todas las recargas (por TTL o por `kid`) se limitan a una cada
+    `min_refresh_interval` segundos, para que tokens con `kid` inventados o un
+    JWKS caído no generen tráfico hacia Clerk, y mientras una está en curso las
+    demás peticiones siguen con las claves anteriores sin esperar. Si la recarga
+    falla se siguen usando las claves anteriores.
+    """
+
+    def __init__(self, jwks_url, ttl=3600, min_refresh_interval=60, timeout=5):
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self):
+        response = get_http_session().get(self.jwks_url, timeout=self.timeout)
+        response.raise_for_status()
+        jwk_set = jwt.PyJWKSet.from_dict(response.json())
+        return {key.key_id: key for key in jwk_set.keys if key.key_id}
+
+    def _refresh(self, force=False):
+        """
+        Recargar las claves; solo un hilo descarga a la vez.
+
+        Sin claves en caché (arranque) se espera a la descarga porque no hay nada
+        que servir. Con claves, la recarga nunca bloquea a otros hilos: si otro
+        ya está descargando o el último intento (con éxito o no) fue hace menos
+        de `min_refresh_interval` segundos, se siguen usando las claves actuales
+        aunque hayan caducado.
+        """
+        if not self._keys:
+            with self._lock:
+                if not self._keys:
+                    self._last_attempt = time.monotonic()
+                    self._keys = self._fetch()
+                    self._fetched_at = time.monotonic()
+                    logger.info(f"JWKS recargado: {len(self._keys)} claves")
+            return
+
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            stale = now - self._fetched_at >= self.ttl
+            if not (force or stale) or now - self._last_attempt < self.min_refresh_interval:
+                return
+            self._last_attempt = now
+            try:
+                self._keys = self._fetch()
+                self._fetched_at = time.monotonic()
+                logger.info(f"JWKS recargado: {len(self._keys)} claves")
+            except Exception as e:
+                logger.warning(f"No se pudo recargar el JWKS, se usan las claves en caché: {str(e)}")
+        finally:
+            self._lock.release()
+
+    def get_signing_key(self, kid):
+        """
+        Obtener la clave pública para un `kid`.
+
+        Args:
+            kid: Identificador de clave del encabezado del token
+
+        Returns:
+            jwt.PyJWK: Clave de firma
+
+        Raises:
+            jwt.PyJWKClientError: Si el `kid` no existe en el JWKS
+        """
+        if not self._keys or time.monotonic() - self._fetched_at >= self.ttl:
+            self._refresh()
+
+        key = self._keys.get(kid)
+        if key is None:
+            self._refresh(force=True)
+            key = self._keys.get(kid)
+
+        if key is None:
+            raise jwt.PyJWKClientError(f"Clave de firma no encontrada para kid={kid}")
+        return key
+
+# Instancia única por proceso
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_jwks_cache(jwks_url, ttl=3600, min_refresh_interval=60, timeout=5):
+    """
+    Obtiene la caché JWKS compartida del proceso.
+
+    Args:
+        jwks_url: URL del JWKS de Clerk
+        ttl: Segundos que se reutilizan las claves descargadas
+        min_refresh_interval: Segundos mínimos entre intentos de recarga, tanto por
+            `kid` desconocido como por claves vencidas (TTL)
+        timeout: Timeout de la descarga en segundos
+
+    Returns:
+        JWKSCache: Instancia única de la caché
+    """
+    global _instance
+    if _instance is None or _instance.jwks_url != jwks_url:
+        with _instance_lock:
+            if _instance is None or _instance.jwks_url != jwks_url:
+                _instance = JWKSCache(jwks_url, ttl, min_refresh_interval, timeout)
+    return _instance
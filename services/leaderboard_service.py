@@ -0,0 +1,176 @@
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Session
+from models import db, Habit, HabitEntry, HabitStreak, GroupMember, User
+from core.cache import TTLCache
+
+LEADERBOARD_PERIODS = ('week', 'month')
+
+_leaderboard_cache = None
+
+_PENDING_HABITS_KEY = 'leaderboard_habit_ids'
+
+def _get_leaderboard_cache():
+    global _leaderboard_cache
+    if _leaderboard_cache is None:
+        _leaderboard_cache = TTLCache(
+            maxsize=current_app.config['GROUP_LEADERBOARD_CACHE_SIZE'],
+            ttl=current_app.config['GROUP_LEADERBOARD_CACHE_TTL']
+        )
+    return _leaderboard_cache
+
+def get_leaderboard_cache_stats():
+    """Estadísticas de la caché de rankings de grupo"""
+    return _get_leaderboard_cache().stats()
+
+def get_period_range(period, hoy_local):
+    """
+    Rango de fechas de un periodo del ranking.
+
+    Args:
+        period: 'week' (desde el lunes) o 'month' (desde el día 1)
+        hoy_local: Fecha local actual
+
+    Returns:
+        tuple: (desde, hasta) inclusive
+    """
+    if period == 'week':
+        return hoy_local - timedelta(days=hoy_local.weekday()), hoy_local
+    return hoy_local.replace(day=1), hoy_local
+
+def _compute_leaderboard(group_id, desde, hasta):
+    habit_ids = [row.id for row in db.session.query(Habit.id).filter(
+        Habit.id_grupo == group_id,
+        Habit.archivado == False
+    )]
+
+    entries = db.session.query(
+        HabitEntry.id_clerk.label('id_clerk'),
+        func.count(HabitEntry.id).label('registros'),
+        func.sum(case((HabitEntry.estado == 'exito', 1), else_=0)).label('exitos'),
+        func.sum(case((HabitEntry.estado == 'fallo', 1), else_=0)).label('fallos')
+    ).filter(
+        HabitEntry.id_habito.in_(habit_ids),
+        HabitEntry.fecha >= desde,
+        HabitEntry.fecha <= hasta
+    ).group_by(HabitEntry.id_clerk).subquery()
+
+    # Una racha sigue viva si su último éxito fue hoy o ayer
+    live_streak = case((HabitStreak.ultima_fecha >= hasta - timedelta(days=1), HabitStreak.racha_actual), else_=0)
+    streaks = db.session.query(
+        HabitStreak.id_clerk.label('id_clerk'),
+        func.max(live_streak).label('racha_actual'),
+        func.sum(case((live_streak > 0, 1), else_=0)).label('rachas_activas')
+    ).filter(
+        HabitStreak.id_habito.in_(habit_ids)
+    ).group_by(HabitStreak.id_clerk).subquery()
+
+    rows = db.session.query(
+        GroupMember.id_clerk,
+        User.nombre_completo,
+        func.coalesce(entries.c.registros, 0).label('registros'),
+        func.coalesce(entries.c.exitos, 0).label('exitos'),
+        func.coalesce(entries.c.fallos, 0).label('fallos'),
+        func.coalesce(streaks.c.racha_actual, 0).label('racha_actual'),
+        func.coalesce(streaks.c.rachas_activas, 0).label('rachas_activas')
+    ).join(
+        User, User.id_clerk == GroupMember.id_clerk
+    ).outerjoin(
+        entries, entries.c.id_clerk == GroupMember.id_clerk
+    ).outerjoin(
+        streaks, streaks.c.id_clerk == GroupMember.id_clerk
+    ).filter(
+        GroupMember.id_grupo == group_id
+    ).all()
+
+    ranking = []
+    for row in rows:
+        registros = int(row.registros)
+        exitos = int(row.exitos)
+        ranking.append({
+            'id_clerk': row.id_clerk,
+            'nombre': row.nombre_completo,
+            'registros': registros,
+            'exitos': exitos,
+            'fallos': int(row.fallos),
+            'tasa_exito': round(exitos / registros * 100, 1) if registros else 0,
+            'racha_actual': int(row.racha_actual),
+            'rachas_activas': int(row.rachas_activas)
+        })
+    ranking.sort(key=lambda item: (-item['tasa_exito'], -item['racha_actual'], -item['exitos'], item['id_clerk']))
+    for position, item in enumerate(ranking, start=1):
+        item['posicion'] = position
+
+    return {'habit_ids': frozenset(habit_ids), 'total_habitos': len(habit_ids), 'ranking': ranking}
+
+def load_group_leaderboard(group_id, period, hoy_local):
+    """
+    Ranking de los miembros de un grupo por tasa de éxito y racha actual en
+    todos los hábitos activos del grupo.
+
+    Se calcula con una única consulta agregada (miembros unidos a los totales de
+    registros del periodo y a las rachas) y se guarda en caché por grupo, periodo
+    y rango de fechas. Cualquier escritura de registros de un hábito del grupo o
+    cambio de miembros invalida la entrada tras el commit. La caché es propia de
+    cada proceso y la invalidación solo llega al worker que hizo la escritura,
+    así que en los demás un ranking puede estar desfasado hasta
+    GROUP_LEADERBOARD_CACHE_TTL segundos.
+
+    Args:
+        group_id: ID del grupo
+        period: 'week' o 'month'
+        hoy_local: Fecha local de quien consulta
+
+    Returns:
+        dict: desde, hasta, total_habitos y ranking
+    """
+    desde, hasta = get_period_range(period, hoy_local)
+    cache = _get_leaderboard_cache()
+    key = (group_id, period, desde, hasta)
+
+    leaderboard = cache.get(key)
+    if leaderboard is None:
+        leaderboard = _compute_leaderboard(group_id, desde, hasta)
+        cache.set(key, leaderboard)
+
+    return {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'total_habitos': leaderboard['total_habitos'],
+        'ranking': leaderboard['ranking']
+    }
+
+def invalidate_habit_leaderboards(habit_ids):
+    """Descartar los rankings en caché de los grupos que contienen alguno de estos hábitos"""
+    habit_ids = set(habit_ids)
+    if _leaderboard_cache is None or not habit_ids:
+        return 0
+    return _leaderboard_cache.delete_where(lambda key, value: not value['habit_ids'].isdisjoint(habit_ids))
+
+def invalidate_habit_leaderboards_on_commit(habit_ids):
+    """
+    Programar la invalidación de los rankings de estos hábitos para cuando se
+    confirme la transacción actual.
+
+    Invalidar antes del commit dejaría que una lectura concurrente volviera a
+    guardar el ranking anterior durante todo el TTL; si la transacción se
+    deshace no se invalida nada.
+    """
+    db.session.info.setdefault(_PENDING_HABITS_KEY, set()).update(habit_ids)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    habit_ids = session.info.pop(_PENDING_HABITS_KEY, None)
+    if habit_ids:
+        invalidate_habit_leaderboards(habit_ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop(_PENDING_HABITS_KEY, None)
+
+def invalidate_group_leaderboard(group_id):
+    """Descartar los rankings en caché de un grupo (p. ej. al cambiar sus miembros)"""
+    if _leaderboard_cache is None:
+        return 0
+    return _leaderboard_cache.delete_where(lambda key, value: key[0] == group_id)
@@ -0,0 +1,144 @@
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import or_, update
+from config.mail_config import mail
+from models import db, EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+def claim_batch(batch_size, now=None):
+    """
+    Reservar un lote de correos pendientes para este proceso.
+
+    Bloquea las filas elegibles, les pone `bloqueado_hasta` (lease) y confirma,
+    de modo que otro sender que corra a la vez no tome los mismos correos. Si el
+    proceso muere a mitad del envío, el lease vence y el lote vuelve a la cola.
+
+    Args:
+        batch_size: Máximo de correos a reservar
+        now: Momento de referencia en UTC (por defecto ahora)
+
+    Returns:
+        list: Correos reservados como dicts (id, destinatario, asunto, html, intentos)
+    """
+    now = now or datetime.utcnow()
+    emails = EmailOutbox.query.filter(
+        EmailOutbox.estado == 'pendiente',
+        EmailOutbox.siguiente_intento <= now,
+        or_(EmailOutbox.bloqueado_hasta.is_(None), EmailOutbox.bloqueado_hasta <= now)
+    ).order_by(EmailOutbox.siguiente_intento).limit(batch_size).with_for_update().all()
+    if not emails:
+        db.session.commit()
+        return []
+
+    lease = now + timedelta(seconds=current_app.config['MAIL_OUTBOX_LEASE_SECONDS'])
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_([email.id for email in emails]))
+        .values(bloqueado_hasta=lease)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = [{
+        'id': email.id,
+        'destinatario': email.destinatario,
+        'asunto': email.asunto,
+        'html': email.html,
+        'intentos': email.intentos
+    } for email in emails]
+    db.session.commit()
+    return claimed
+
+def retry_delay(attempts):
+    """Espera antes del siguiente intento: base * 2^(intentos-1), con tope"""
+    base = current_app.config['MAIL_OUTBOX_RETRY_BASE_SECONDS']
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), current_app.config['MAIL_OUTBOX_RETRY_MAX_SECONDS']))
+
+def _record_failure(email, error, now):
+    attempts = email['intentos'] + 1
+    message = str(error) or error.__class__.__name__
+    values = {'intentos': attempts, 'ultimo_error': message[:1000], 'bloqueado_hasta': None}
+    if attempts >= current_app.config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+        values['estado'] = 'fallido'
+    else:
+        values['siguiente_intento'] = now + retry_delay(attempts)
+    db.session.execute(update(EmailOutbox).where(EmailOutbox.id == email['id']).values(**values))
+    return values.get('estado') == 'fallido'
+
+def send_outbox_batch(batch_size=None, now=None):
+    """
+    Enviar un lote de correo_salida reutilizando una sola conexión SMTP.
+
+    Reserva hasta `batch_size` correos, abre una conexión con `mail.connect()`
+    y envía todos por ella. Cada correo enviado queda como 'enviado'; los que
+    fallan se reprograman con backoff exponencial hasta MAIL_OUTBOX_MAX_ATTEMPTS
+    y después quedan como 'fallido' con el último error. Si no se puede abrir la
+    conexión, todo el lote cuenta como intento fallido.
+
+    Args:
+        batch_size: Correos por lote (por defecto MAIL_OUTBOX_BATCH_SIZE)
+        now: Momento de referencia en UTC (por defecto ahora)
+
+    Returns:
+        dict: Contadores de reservados, enviados, reintentos y fallidos
+    """
+    batch_size = batch_size or current_app.config['MAIL_OUTBOX_BATCH_SIZE']
+    now = now or datetime.utcnow()
+    emails = claim_batch(batch_size, now=now)
+    stats = {'reservados': len(emails), 'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+    if not emails:
+        return stats
+
+    try:
+        with mail.connect() as connection:
+            for email in emails:
+                try:
+                    connection.send(Message(subject=email['asunto'], recipients=[email['destinatario']], html=email['html']))
+                except Exception as e:
+                    logger.warning(f"Error al enviar correo {email['id']} a {email['destinatario']}: {str(e)}")
+                    failed = _record_failure(email, e, now)
+                    stats['fallidos' if failed else 'reintentos'] += 1
+                    continue
+                db.session.execute(update(EmailOutbox).where(EmailOutbox.id == email['id']).values(
+                    estado='enviado',
+                    intentos=email['intentos'] + 1,
+                    enviado_en=datetime.utcnow(),
+                    bloqueado_hasta=None,
+                    ultimo_error=None
+                ))
+                stats['enviados'] += 1
+    except Exception as e:
+        # Fallo al conectar o al cerrar: los correos aún sin resultado cuentan como intento fallido
+        logger.error(f"Error de conexión SMTP: {str(e)}")
+        done = stats['enviados'] + stats['reintentos'] + stats['fallidos']
+        for email in emails[done:]:
+            failed = _record_failure(email, e, now)
+            stats['fallidos' if failed else 'reintentos'] += 1
+
+    db.session.commit()
+    return stats
+
+def send_outbox(batch_size=None, max_batches=None):
+    """
+    Vaciar la cola enviando lotes hasta que no queden correos listos.
+
+    Args:
+        batch_size: Correos por lote (por defecto MAIL_OUTBOX_BATCH_SIZE)
+        max_batches: Límite de lotes por ejecución (por defecto sin límite)
+
+    Returns:
+        dict: Totales de la ejecución
+    """
+    totals = {'lotes': 0, 'reservados': 0, 'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+    while max_batches is None or totals['lotes'] < max_batches:
+        stats = send_outbox_batch(batch_size=batch_size)
+        if not stats['reservados']:
+            break
+        totals['lotes'] += 1
+        for key, value in stats.items():
+            totals[key] += value
+        if stats['enviados'] == 0:
+            # Nada salió en este lote (p. ej. servidor caído): esperar al siguiente ciclo
+            break
+    return totals
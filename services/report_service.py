@@ -0,0 +1,69 @@
+from collections import namedtuple
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import case, func, or_
+from models import db, Habit, HabitEntry, GroupMember
+from services.daily_rollup_service import load_daily_totals
+
+DayTotals = namedtuple('DayTotals', ['fecha', 'exitos', 'fallos'])
+
+def count_active_habits(user_id):
+    """Hábitos no archivados a los que el usuario tiene acceso (propios o de sus grupos)"""
+    return db.session.query(func.count(Habit.id)).filter(
+        or_(
+            Habit.id_propietario == user_id,
+            Habit.id_grupo.in_(
+                db.session.query(GroupMember.id_grupo).filter_by(id_clerk=user_id)
+            )
+        ),
+        Habit.archivado == False
+    ).scalar()
+
+def get_daily_totals(user_id, desde, hasta):
+    """
+    Éxitos y fallos por fecha de un usuario, solo para los días con registros.
+
+    Con REPORTS_USE_DAILY_ROLLUP se lee registro_resumen_diario; si no, una
+    sola consulta agregada por rango sobre habito_registros agrupada por fecha
+    (índice idx_reg_clerk_fecha).
+
+    Returns:
+        dict: fecha -> (exitos, fallos)
+    """
+    if current_app.config['REPORTS_USE_DAILY_ROLLUP']:
+        return load_daily_totals(user_id, desde, hasta)
+
+    rows = db.session.query(
+        HabitEntry.fecha,
+        func.sum(case((HabitEntry.estado == 'exito', 1), else_=0)).label('exitos'),
+        func.sum(case((HabitEntry.estado == 'fallo', 1), else_=0)).label('fallos')
+    ).filter(
+        HabitEntry.id_clerk == user_id,
+        HabitEntry.fecha >= desde,
+        HabitEntry.fecha <= hasta
+    ).group_by(HabitEntry.fecha).all()
+    return {row.fecha: (int(row.exitos or 0), int(row.fallos or 0)) for row in rows}
+
+def get_period_rollup(user_id, desde, hasta):
+    """
+    Éxitos y fallos por día de un usuario en un rango de fechas.
+
+    Los días sin registros se devuelven con ceros para que los reportes no
+    tengan que rellenar huecos.
+
+    Args:
+        user_id: ID del usuario
+        desde: Primer día del periodo (inclusive)
+        hasta: Último día del periodo (inclusive)
+
+    Returns:
+        list: DayTotals(fecha, exitos, fallos) para cada día del periodo, en orden
+    """
+    totals = get_daily_totals(user_id, desde, hasta)
+
+    days = []
+    fecha = desde
+    while fecha <= hasta:
+        days.append(DayTotals(fecha, *totals.get(fecha, (0, 0))))
+        fecha += timedelta(days=1)
+    return days
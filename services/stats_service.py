@@ -1,6 +1,8 @@
 from models import db, User, Habit, HabitEntry, HabitStreak
 from sqlalchemy import func
 from datetime import datetime, timedelta
+from services.auth_service import get_token_cache_stats
+from services.clerk_service import get_profile_cache_stats
 
 def get_system_stats():
     """Obtener estadísticas generales del sistema"""
@@ -30,5 +32,7 @@ def get_system_stats():
         'active_users': active_users or 0,
         'completed_habits': completed_habits or 0,
         'success_rate': success_rate or 0,
-        'average_streak': round(float(avg_streak or 0), 1)
+        'average_streak': round(float(avg_streak or 0), 1),
+        'auth_token_cache': get_token_cache_stats(),
+        'clerk_profile_cache': get_profile_cache_stats()
     }
@@ -0,0 +1,145 @@
+import logging
+from datetime import datetime, timedelta
+import pytz
+from flask import current_app
+from sqlalchemy import case, or_, select, tuple_, update
+from models import db, User, HabitEntry, HabitStreak
+from core.datetime_util import DateTimeUtil
+from services.entry_service import insert_missing_entries
+from services.habit_service import resolve_streak_breaks, auto_failure_row
+
+logger = logging.getLogger(__name__)
+
+def get_rollover_buckets():
+    """
+    Obtener los grupos (zona horaria, hora de cierre) de usuarios que tienen rachas.
+
+    Returns:
+        list: Tuplas (zona_horaria, cierre_dia_hora)
+    """
+    return db.session.query(User.zona_horaria, User.cierre_dia_hora).join(
+        HabitStreak, HabitStreak.id_clerk == User.id_clerk
+    ).distinct().all()
+
+def _bucket_dates(timezone_name, closure_hour, now_utc):
+    tz = DateTimeUtil.get_timezone(timezone_name)
+    if tz is None:
+        tz = DateTimeUtil.get_timezone(current_app.config.get('TIMEZONE_DEFAULT', 'UTC')) or pytz.UTC
+    now_local = now_utc.astimezone(tz)
+    hoy_local = (now_local - timedelta(hours=closure_hour or 0)).date()
+    return hoy_local, hoy_local - timedelta(days=1), now_local
+
+def rollover_bucket(timezone_name, closure_hour, now_utc=None, batch_size=500):
+    """
+    Cerrar el día para todas las rachas de los usuarios de un grupo (zona horaria, hora de cierre).
+
+    Las rachas en 0 solo se marcan como revisadas con un único UPDATE. Las rachas
+    activas se procesan en lotes: se leen los registros de ayer del lote, se rompen
+    las que no tuvieron éxito (insertando el fallo automático si no hubo registro)
+    y se confirma cada lote por separado.
+
+    Args:
+        timezone_name: Zona horaria del grupo
+        closure_hour: Hora de cierre del día del grupo
+        now_utc: Momento de referencia (por defecto ahora)
+        batch_size: Rachas activas por lote
+
+    Returns:
+        dict: Contadores del grupo procesado
+    """
+    now_utc = now_utc or datetime.now(pytz.UTC)
+    hoy_local, ayer_local, now_local = _bucket_dates(timezone_name, closure_hour, now_utc)
+
+    bucket_users = select(User.id_clerk).where(
+        User.zona_horaria == timezone_name if timezone_name is not None else User.zona_horaria.is_(None),
+        User.cierre_dia_hora == closure_hour if closure_hour is not None else User.cierre_dia_hora.is_(None)
+    )
+    not_reviewed = or_(
+        HabitStreak.ultima_revision_local.is_(None),
+        HabitStreak.ultima_revision_local < hoy_local
+    )
+    stats = {'revisadas': 0, 'rotas': 0, 'fallos_automaticos': 0}
+
+    idle = db.session.execute(
+        update(HabitStreak)
+        .where(HabitStreak.id_clerk.in_(bucket_users), HabitStreak.racha_actual <= 0, not_reviewed)
+        .values(ultima_revision_local=hoy_local)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    stats['revisadas'] += idle.rowcount or 0
+
+    while True:
+        keys = [tuple(row) for row in db.session.query(HabitStreak.id_habito, HabitStreak.id_clerk).filter(
+            HabitStreak.id_clerk.in_(bucket_users),
+            HabitStreak.racha_actual > 0,
+            not_reviewed
+        ).limit(batch_size).all()]
+        if not keys:
+            break
+
+        yesterday = {
+            (row.id_habito, row.id_clerk): row.estado
+            for row in db.session.query(HabitEntry.id_habito, HabitEntry.id_clerk, HabitEntry.estado).filter(
+                HabitEntry.fecha == ayer_local,
+                tuple_(HabitEntry.id_habito, HabitEntry.id_clerk).in_(keys)
+            )
+        }
+        broken, auto_failures = resolve_streak_breaks(keys, yesterday)
+
+        if auto_failures:
+            insert_missing_entries([
+                auto_failure_row(habit_id, user_id, ayer_local, now_local)
+                for habit_id, user_id in auto_failures
+            ])
+
+        values = {'ultima_revision_local': hoy_local}
+        if broken:
+            values['racha_actual'] = case(
+                (tuple_(HabitStreak.id_habito, HabitStreak.id_clerk).in_(broken), 0),
+                else_=HabitStreak.racha_actual
+            )
+        updated = db.session.execute(
+            update(HabitStreak)
+            .where(tuple_(HabitStreak.id_habito, HabitStreak.id_clerk).in_(keys))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        stats['revisadas'] += updated.rowcount or 0
+        stats['rotas'] += len(broken)
+        stats['fallos_automaticos'] += len(auto_failures)
+        if not updated.rowcount:
+            break
+
+    return stats
+
+def run_rollover(now_utc=None, batch_size=None):
+    """
+    Ejecutar el cambio de día de rachas para todos los grupos de zona horaria.
+
+    Es idempotente: solo toca rachas cuya última revisión es anterior al día local
+    actual de su usuario, por lo que puede programarse cada hora (p. ej. con cron)
+    y cada grupo se procesa cuando su día local ya cambió.
+
+    Args:
+        now_utc: Momento de referencia (por defecto ahora)
+        batch_size: Rachas activas por lote (por defecto STREAK_ROLLOVER_BATCH_SIZE)
+
+    Returns:
+        dict: Totales del proceso
+    """
+    now_utc = now_utc or datetime.now(pytz.UTC)
+    batch_size = batch_size or current_app.config.get('STREAK_ROLLOVER_BATCH_SIZE', 500)
+    totals = {'grupos': 0, 'revisadas': 0, 'rotas': 0, 'fallos_automaticos': 0}
+
+    for timezone_name, closure_hour in get_rollover_buckets():
+        stats = rollover_bucket(timezone_name, closure_hour, now_utc=now_utc, batch_size=batch_size)
+        totals['grupos'] += 1
+        for key, value in stats.items():
+            totals[key] += value
+        if stats['revisadas']:
+            logger.info(f"Rollover {timezone_name} (cierre {closure_hour}h): {stats}")
+
+    return totals
@@ -0,0 +1,213 @@
+import uuid
+from datetime import timedelta
+from sqlalchemy import delete, func, insert, update
+from models import db, HabitEntry, HabitStreak, HabitStreakRun
+
+def _runs_query(habit_id, user_id):
+    return HabitStreakRun.query.filter_by(id_habito=habit_id, id_clerk=user_id)
+
+def add_success_day(habit_id, user_id, fecha):
+    """
+    Marcar un día como éxito en los tramos de racha, uniendo tramos adyacentes.
+
+    Solo consulta los tramos que tocan `fecha` (a lo sumo dos) por índice, sin
+    recorrer el historial.
+
+    Args:
+        habit_id: ID del hábito
+        user_id: ID del usuario
+        fecha: Día con éxito
+
+    Returns:
+        int: Longitud del tramo que contiene `fecha` tras la operación
+    """
+    day_before = fecha - timedelta(days=1)
+    day_after = fecha + timedelta(days=1)
+    runs = _runs_query(habit_id, user_id).filter(
+        HabitStreakRun.fin >= day_before,
+        HabitStreakRun.inicio <= day_after
+    ).all()
+
+    for run in runs:
+        if run.inicio <= fecha <= run.fin:
+            return run.longitud
+
+    left = next((run for run in runs if run.fin == day_before), None)
+    right = next((run for run in runs if run.inicio == day_after), None)
+
+    if left and right:
+        left.fin = right.fin
+        left.longitud = left.longitud + right.longitud + 1
+        db.session.delete(right)
+        return left.longitud
+    if left:
+        left.fin = fecha
+        left.longitud += 1
+        return left.longitud
+    if right:
+        right.inicio = fecha
+        right.longitud += 1
+        return right.longitud
+
+    db.session.add(HabitStreakRun(
+        id_habito=habit_id,
+        id_clerk=user_id,
+        inicio=fecha,
+        fin=fecha,
+        longitud=1
+    ))
+    return 1
+
+def remove_success_day(habit_id, user_id, fecha):
+    """
+    Quitar un día de los tramos de racha (registro borrado o cambiado a fallo),
+    recortando o partiendo el tramo que lo contiene.
+
+    Args:
+        habit_id: ID del hábito
+        user_id: ID del usuario
+        fecha: Día que deja de ser éxito
+
+    Returns:
+        bool: True si algún tramo cambió
+    """
+    run = _runs_query(habit_id, user_id).filter(
+        HabitStreakRun.inicio <= fecha,
+        HabitStreakRun.fin >= fecha
+    ).first()
+    if not run:
+        return False
+
+    if run.inicio == run.fin:
+        db.session.delete(run)
+    elif fecha == run.inicio:
+        run.inicio = fecha + timedelta(days=1)
+        run.longitud -= 1
+    elif fecha == run.fin:
+        run.fin = fecha - timedelta(days=1)
+        run.longitud -= 1
+    else:
+        tail_end = run.fin
+        run.fin = fecha - timedelta(days=1)
+        run.longitud = (run.fin - run.inicio).days + 1
+        db.session.add(HabitStreakRun(
+            id_habito=habit_id,
+            id_clerk=user_id,
+            inicio=fecha + timedelta(days=1),
+            fin=tail_end,
+            longitud=(tail_end - fecha).days
+        ))
+    return True
+
+def get_current_streak(habit_id, user_id, hoy_local):
+    """
+    Racha actual según los tramos: el tramo que llega a hoy o a ayer.
+
+    Un tramo que termina ayer sigue vivo mientras hoy no tenga un fallo registrado.
+
+    Args:
+        habit_id: ID del hábito
+        user_id: ID del usuario
+        hoy_local: Fecha local actual del usuario
+
+    Returns:
+        int: Días de la racha actual
+    """
+    ayer_local = hoy_local - timedelta(days=1)
+    run = _runs_query(habit_id, user_id).filter(
+        HabitStreakRun.fin >= ayer_local,
+        HabitStreakRun.inicio <= hoy_local
+    ).order_by(HabitStreakRun.fin.desc()).first()
+    if not run:
+        return 0
+
+    if run.fin == ayer_local:
+        today_state = db.session.query(HabitEntry.estado).filter_by(
+            id_habito=habit_id,
+            id_clerk=user_id,
+            fecha=hoy_local
+        ).scalar()
+        if today_state == 'fallo':
+            return 0
+
+    return (min(run.fin, hoy_local) - run.inicio).days + 1
+
+def get_runs_summary(habit_id, user_id):
+    """
+    Mejor racha y último día con éxito a partir de los tramos.
+
+    Returns:
+        tuple: (mejor racha, última fecha con éxito o None)
+    """
+    best, last = db.session.query(
+        func.max(HabitStreakRun.longitud),
+        func.max(HabitStreakRun.fin)
+    ).filter(
+        HabitStreakRun.id_habito == habit_id,
+        HabitStreakRun.id_clerk == user_id
+    ).one()
+    return best or 0, last
+
+def rebuild_runs(habit_id=None, batch_size=1000):
+    """
+    Reconstruir los tramos desde habito_registros y ajustar mejor_racha.
+
+    Recorre los éxitos ordenados por (hábito, usuario, fecha) en streaming y los
+    inserta en bloques. Pensado para poblar la tabla tras la migración o para
+    reparar inconsistencias.
+
+    Args:
+        habit_id: Limitar la reconstrucción a un hábito (por defecto todos)
+        batch_size: Filas por inserción
+
+    Returns:
+        dict: Tramos creados y rachas actualizadas
+    """
+    runs_delete = delete(HabitStreakRun)
+    entries = db.session.query(HabitEntry.id_habito, HabitEntry.id_clerk, HabitEntry.fecha).filter(
+        HabitEntry.estado == 'exito'
+    )
+    if habit_id:
+        runs_delete = runs_delete.where(HabitStreakRun.id_habito == habit_id)
+        entries = entries.filter(HabitEntry.id_habito == habit_id)
+    db.session.execute(runs_delete)
+
+    runs = []
+    current = None
+    for row in entries.order_by(HabitEntry.id_habito, HabitEntry.id_clerk, HabitEntry.fecha).yield_per(batch_size):
+        if (current and current['id_habito'] == row.id_habito and current['id_clerk'] == row.id_clerk
+                and row.fecha == current['fin'] + timedelta(days=1)):
+            current['fin'] = row.fecha
+            current['longitud'] += 1
+            continue
+        current = {
+            'id': str(uuid.uuid4()),
+            'id_habito': row.id_habito,
+            'id_clerk': row.id_clerk,
+            'inicio': row.fecha,
+            'fin': row.fecha,
+            'longitud': 1
+        }
+        runs.append(current)
+
+    # Se inserta al terminar la lectura: con MySQL el cursor en streaming no admite otras sentencias
+    for start in range(0, len(runs), batch_size):
+        db.session.execute(insert(HabitStreakRun), runs[start:start + batch_size])
+
+    best = {}
+    for run in runs:
+        key = (run['id_habito'], run['id_clerk'])
+        best[key] = max(best.get(key, 0), run['longitud'])
+
+    streaks = db.session.query(HabitStreak.id_habito, HabitStreak.id_clerk)
+    if habit_id:
+        streaks = streaks.filter(HabitStreak.id_habito == habit_id)
+    streak_updates = [
+        {'id_habito': row.id_habito, 'id_clerk': row.id_clerk, 'mejor_racha': best.get((row.id_habito, row.id_clerk), 0)}
+        for row in streaks.all()
+    ]
+    for start in range(0, len(streak_updates), batch_size):
+        db.session.execute(update(HabitStreak), streak_updates[start:start + batch_size])
+
+    db.session.commit()
+    return {'tramos': len(runs), 'rachas': len(streak_updates)}
@@ -2,15 +2,93 @@ from datetime import datetime, date, timedelta
 import pytz
 import logging
 from typing import Optional, Union
+from flask import g, has_request_context
 from models import User
 from core.interfaces import IDateTimeService
 from core.datetime_util import DateTimeUtil
 
 logger = logging.getLogger(__name__)
 
+class UserTimeContext:
+    """
+    Datos de tiempo de un usuario (zona horaria, hora de cierre, hoy y ayer locales)
+    calculados una sola vez por petición.
+    """
+    def __init__(self, user_id: str, timezone_name: str, closure_hour: int, tz, now_utc: datetime):
+        self.user_id = user_id
+        self.timezone_name = timezone_name
+        self.closure_hour = closure_hour or 0
+        self.tz = tz
+        self.now_local = now_utc.astimezone(tz)
+        self.today = (self.now_local - timedelta(hours=self.closure_hour)).date()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def local_date(self, target_date: Union[datetime, date]) -> date:
+        """Fecha local ajustada por hora de cierre para una fecha/hora dada"""
+        if isinstance(target_date, date) and not isinstance(target_date, datetime):
+            target_date = datetime.combine(target_date, datetime.min.time())
+        if target_date.tzinfo is None:
+            target_date = self.tz.localize(target_date)
+        local = target_date.astimezone(self.tz)
+        return (local - timedelta(hours=self.closure_hour)).date()
+
 class TimezoneService(IDateTimeService):
     def __init__(self, default_timezone='UTC'):
         self.default_timezone = default_timezone
+    
+    def get_user_time_context(self, user_id: str, user: Optional[User] = None) -> UserTimeContext:
+        """
+        Obtener el contexto de tiempo de un usuario.
+        
+        Dentro de una petición se calcula una vez por usuario y se guarda en `g`;
+        para el usuario autenticado se reutiliza `g.current_user` sin consultar la base de datos.
+        
+        Args:
+            user_id: ID del usuario
+            user: Usuario ya cargado (evita la consulta, p. ej. al listar miembros de un grupo)
+            
+        Returns:
+            UserTimeContext: Contexto de tiempo del usuario
+        """
+        contexts = None
+        if has_request_context():
+            contexts = g.setdefault('user_time_contexts', {})
+            if user_id in contexts:
+                return contexts[user_id]
+        
+        if user is None:
+            current_user = g.get('current_user') if has_request_context() else None
+            if current_user is not None and current_user.id_clerk == user_id:
+                user = current_user
+            elif user_id:
+                user = User.query.filter_by(id_clerk=user_id).first()
+        
+        if not user:
+            if user_id:
+                logger.warning(f"Usuario {user_id} no encontrado, usando configuración por defecto")
+            timezone_name = self.default_timezone
+            closure_hour = 0
+        else:
+            timezone_name = user.zona_horaria
+            closure_hour = getattr(user, 'cierre_dia_hora', 0)
+        
+        tz = DateTimeUtil.get_timezone(timezone_name)
+        if tz is None:
+            logger.warning(f"Zona horaria inválida para usuario {user_id}, usando {self.default_timezone}")
+            tz = DateTimeUtil.get_timezone(self.default_timezone)
+        
+        context = UserTimeContext(user_id, tz.zone, closure_hour, tz, datetime.now(pytz.UTC))
+        if contexts is not None:
+            contexts[user_id] = context
+        return context
+    
+    def reset_user_time_context(self, user_id: str = None) -> None:
+        """Descartar el contexto de la petición (p. ej. tras cambiar zona horaria u hora de cierre)"""
+        if has_request_context() and 'user_time_contexts' in g:
+            if user_id is None:
+                g.user_time_contexts.clear()
+            else:
+                g.user_time_contexts.pop(user_id, None)
         
     def to_utc(self, dt: datetime, timezone: str) -> datetime:
         """
@@ -27,12 +105,12 @@ class TimezoneService(IDateTimeService):
             ValueError: Si la fecha/hora o zona horaria son inválidas
         """
         try:
-            validated_timezone = DateTimeUtil.validate_timezone(timezone)
-            if not validated_timezone:
+            tz = DateTimeUtil.get_timezone(timezone)
+            if tz is None:
                 raise ValueError(f"Zona horaria inválida: {timezone}")
                 
             if dt.tzinfo is None:
-                dt = pytz.timezone(validated_timezone).localize(dt)
+                dt = tz.localize(dt)
                 
             return dt.astimezone(pytz.UTC)
         except Exception as e:
@@ -57,15 +135,15 @@ class TimezoneService(IDateTimeService):
         try:
             dt = DateTimeUtil.ensure_utc(dt)
             
-            user = User.query.get(user_id)
-            timezone_name = user.zona_horaria if user else (default_timezone or self.default_timezone)
+            if user_id:
+                return dt.astimezone(self.get_user_time_context(user_id).tz)
             
-            validated_timezone = DateTimeUtil.validate_timezone(timezone_name)
-            if not validated_timezone:
-                logger.warning(f"Zona horaria inválida para usuario {user_id}, usando {self.default_timezone}")
-                validated_timezone = self.default_timezone
+            timezone_name = default_timezone or self.default_timezone
+            tz = DateTimeUtil.get_timezone(timezone_name)
+            if tz is None:
+                logger.warning(f"Zona horaria inválida: {timezone_name}, usando {self.default_timezone}")
+                tz = DateTimeUtil.get_timezone(self.default_timezone)
                 
-            tz = pytz.timezone(validated_timezone)
             return dt.astimezone(tz)
         except Exception as e:
             logger.error(f"Error en conversión de zona horaria: {str(e)}")
@@ -82,16 +160,7 @@ class TimezoneService(IDateTimeService):
             datetime: Fecha y hora actual en la zona horaria del usuario
         """
         try:
-            utc_now = datetime.now(pytz.UTC)
-            user = User.query.filter_by(id_clerk=user_id).first()
-            timezone_name = user.zona_horaria if user else self.default_timezone
-            
-            validated_timezone = DateTimeUtil.validate_timezone(timezone_name)
-            if not validated_timezone:
-                logger.warning(f"Zona horaria inválida para usuario {user_id}, usando {self.default_timezone}")
-                validated_timezone = self.default_timezone
-                
-            return self.to_user_timezone(utc_now, user_id, validated_timezone)
+            return datetime.now(self.get_user_time_context(user_id).tz)
         except Exception as e:
             logger.error(f"Error al obtener datetime local: {str(e)}")
             return datetime.now(pytz.UTC)
@@ -108,38 +177,10 @@ class TimezoneService(IDateTimeService):
             date: Fecha local del usuario ajustada según su configuración
         """
         try:
-            user = User.query.filter_by(id_clerk=user_id).first()
-            if not user:
-                logger.warning(f"Usuario {user_id} no encontrado, usando configuración por defecto")
-                timezone_name = self.default_timezone
-                closure_hour = 0
-            else:
-                timezone_name = user.zona_horaria
-                closure_hour = getattr(user, 'cierre_dia_hora', 0)
-            
-            # Validar y obtener zona horaria
-            validated_timezone = DateTimeUtil.validate_timezone(timezone_name)
-            if not validated_timezone:
-                logger.warning(f"Zona horaria inválida para usuario {user_id}, usando {self.default_timezone}")
-                validated_timezone = self.default_timezone
-                
-            tz = pytz.timezone(validated_timezone)
-            
-            # Obtener fecha/hora actual en la zona horaria del usuario
+            context = self.get_user_time_context(user_id)
             if target_date is None:
-                now_local = datetime.now(tz)
-            else:
-                # Convertir fecha objetivo a datetime si es necesario
-                if isinstance(target_date, date):
-                    target_date = datetime.combine(target_date, datetime.min.time())
-                # Asegurar que tiene zona horaria
-                if target_date.tzinfo is None:
-                    target_date = tz.localize(target_date)
-                now_local = target_date.astimezone(tz)
-            
-            # Ajustar por hora de cierre
-            adjusted_date = now_local - timedelta(hours=closure_hour)
-            return adjusted_date.date()
+                return context.today
+            return context.local_date(target_date)
             
         except Exception as e:
             logger.error(f"Error al obtener fecha local para usuario {user_id}: {str(e)}")
@@ -164,6 +205,17 @@ def get_timezone_service(default_timezone='UTC'):
         _instance = TimezoneService(default_timezone)
     return _instance
 
+def get_user_time_context(user_id: str, user: Optional[User] = None) -> UserTimeContext:
+    """
+    Obtiene el contexto de tiempo (zona horaria, hoy y ayer locales) del usuario.
+    Wrapper para el método de TimezoneService.
+    """
+    return get_timezone_service().get_user_time_context(user_id, user=user)
+
+def reset_user_time_context(user_id: str = None) -> None:
+    """Descarta el contexto de tiempo en caché de la petición actual"""
+    get_timezone_service().reset_user_time_context(user_id)
+
 def get_user_local_date(user_id: str, target_date=None):
     """
     Obtiene la fecha local del usuario según su zona horaria.